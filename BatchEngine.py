@@ -0,0 +1,335 @@
+# The batch engine stabilizes many boards of the same dimension at once. It
+# represents a batch of boards as a single NumPy array with 4 dimensions: the
+# board in the batch, the row (the bottom row first), the column (the leftmost
+# column first) and the property of the cell. The properties of a cell are the
+# identification of the block occupying it (0 for free cells), and the length,
+# the type and the color of that block. Identifications of blocks are unique
+# within a single board of the batch.
+# This module requires NumPy.
+import numpy
+import Dimension
+import Position
+import Block
+import Board
+
+CELL_ID     = 0
+CELL_LENGTH = 1
+CELL_TYPE   = 2
+CELL_COLOR  = 3
+
+# Game.get_move_with_highest_score only uses the batch engine for at least this
+# number of moves. Measured on positions of greedy games, the batch engine takes
+# about 0.15 ms for a single move, where scoring it on its own takes 0.07 ms. Both
+# break even at about 5 moves. From then on, the batch engine is faster: 0.5 ms
+# against 0.8 ms for 10 moves on 8x10 boards, 3 ms against 12 ms on 16x20 boards
+# and 27 ms against 46 ms on 26x40 boards. The first use also imports NumPy,
+# which takes about 0.1 s.
+MIN_NB_OF_MOVES_FOR_BATCH = 6
+
+
+def board_to_array(board):
+    """
+        Return a NumPy array representing the given board.
+        - The resulting array has 3 dimensions: the row (the bottom row first), the
+          column (the leftmost column first) and the property of the cell.
+        - The blocks on the given board are identified by their index in the list
+          of all the blocks on the board (see Board.get_all_blocks), incremented by 1.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    dimension = Board.get_dimension(board)
+    cells = numpy.zeros((Dimension.get_nb_of_rows(dimension), Dimension.get_nb_of_columns(dimension), 4),
+                        dtype=numpy.int64)
+    all_blocks = Board.get_all_blocks(board)
+    for block_index in range(0, len(all_blocks)):
+        block = all_blocks[block_index]
+        position = Board.get_leftmost_position_of(board, block)
+        row_index = Position.nb_of_row(dimension, Position.get_row(position)) - 1
+        column_index = Position.get_column(position) - 1
+        cells[row_index, column_index:column_index + Block.get_length(block)] = \
+            (block_index + 1, Block.get_length(block), Block.get_type(block), Block.get_color(block))
+    return cells
+
+
+def array_to_board(cells):
+    """
+        Return a new board with new blocks, in the same state as the board represented
+        by the given NumPy array.
+        ASSUMPTIONS
+        - The given array represents a single board as described for board_to_array.
+    """
+    nb_rows, nb_columns, _ = numpy.shape(cells)
+    dimension = (nb_rows, nb_columns)
+    board = Board.make_board(dimension)
+    for row_index in range(0, nb_rows):
+        column_index = 0
+        while column_index < nb_columns:
+            block_id, length, type, color = [int(value) for value in cells[row_index, column_index]]
+            if block_id == 0:
+                column_index += 1
+            else:
+                Board.add_block_at(board, Block.make_block(length, type, color),
+                                   (Position.id_of_row(dimension, row_index + 1), column_index + 1))
+                column_index += length
+    return board
+
+
+def make_batch_of_moves(board, moves):
+    """
+        Return a NumPy array representing a batch of boards, each of them in the
+        state of the given board after one of the given moves.
+        - The given moves are collected in a sequence of tuples consisting of a block
+          to move followed by the distance to move it over. The boards in the
+          resulting batch are in the same order as the given moves.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - Each block in the given moves is loaded on the given board, and can move
+          over the distance associated with it.
+    """
+    dimension = Board.get_dimension(board)
+    cells = board_to_array(board)
+    batch = numpy.repeat(cells[numpy.newaxis], len(moves), axis=0)
+    for move_index in range(0, len(moves)):
+        block, nb_steps = moves[move_index]
+        position = Board.get_leftmost_position_of(board, block)
+        row_index = Position.nb_of_row(dimension, Position.get_row(position)) - 1
+        first_column_index = Position.get_column(position) - 1
+        last_column_index = first_column_index + Block.get_length(block)
+        batch[move_index, row_index, first_column_index:last_column_index] = 0
+        batch[move_index, row_index, first_column_index + nb_steps:last_column_index + nb_steps] = \
+            cells[row_index, first_column_index:last_column_index]
+    return batch
+
+
+def get_leftmost_cells(cells):
+    """
+        Return a NumPy array of booleans marking the cells in the given batch of
+        boards that are the leftmost cell of some block.
+        ASSUMPTIONS
+        - The given array represents a batch of boards.
+    """
+    block_ids = cells[..., CELL_ID]
+    leftmost_cells = block_ids != 0
+    leftmost_cells[..., 1:] &= block_ids[..., 1:] != block_ids[..., :-1]
+    return leftmost_cells
+
+
+def get_cells_of_marked_blocks(cells, marked_cells):
+    """
+        Return a NumPy array of booleans marking all the cells in the given batch of
+        boards that are occupied by a block of which at least one cell is marked in
+        the given array of booleans.
+        ASSUMPTIONS
+        - The given array of cells represents a batch of boards.
+        - The given array of booleans has the shape of that batch without the
+          properties of the cells, and only marks occupied cells.
+    """
+    block_ids = cells[..., CELL_ID]
+    occupied_cells = block_ids != 0
+    result = numpy.array(marked_cells)
+    max_length = int(numpy.max(cells[..., CELL_LENGTH], initial=1))
+    # Cells of the same block are at most the maximal length minus 1 columns apart.
+    for distance in range(1, max_length):
+        same_block = occupied_cells[..., distance:] & (block_ids[..., distance:] == block_ids[..., :-distance])
+        result[..., distance:] |= same_block & marked_cells[..., :-distance]
+        result[..., :-distance] |= same_block & marked_cells[..., distance:]
+    return result
+
+
+def get_cells_adjacent_vertically(cells, marked_cells):
+    """
+        Return a NumPy array of booleans marking all the occupied cells in the given
+        batch of boards that are directly above or directly below a cell marked in the
+        given array of booleans.
+        ASSUMPTIONS
+        - The given array of cells represents a batch of boards.
+        - The given array of booleans has the shape of that batch without the
+          properties of the cells.
+    """
+    result = numpy.zeros_like(marked_cells)
+    result[:, :-1] |= marked_cells[:, 1:]
+    result[:, 1:] |= marked_cells[:, :-1]
+    return result & (cells[..., CELL_ID] != 0)
+
+
+def get_cells_to_explode(cells, full_rows):
+    """
+        Return a tuple consisting of a NumPy array of booleans marking all the cells
+        in the given batch of boards occupied by blocks that explode when all the
+        blocks in the given full rows explode, followed by a NumPy array of booleans
+        marking the boards on which the outcome depends on the order of explosions.
+        - The blocks that explode are the blocks in the full rows, extended with the
+          blocks directly above or below each electrified block that explodes. On
+          boards on which no fragile block is directly above or below an electrified
+          block that explodes, these are exactly the blocks that explode in
+          Game.let_all_full_rows_explode, whatever the order of explosions.
+        - If a fragile block is directly above or below an electrified block that
+          explodes, the blocks replacing it may explode as well, depending on which
+          of both blocks explodes first. Such boards are marked in the second array.
+        ASSUMPTIONS
+        - The given array of cells represents a batch of boards.
+        - The given full rows are a NumPy array of booleans marking the rows that are
+          completely filled on each board.
+    """
+    cells_to_explode = full_rows[:, :, numpy.newaxis] & (cells[..., CELL_ID] != 0)
+    electrified_cells = cells[..., CELL_TYPE] == Block.ELECTRIFIED
+    # Each round adds the blocks adjacent to the electrified blocks found so far.
+    while True:
+        cells_hit = get_cells_adjacent_vertically(cells, cells_to_explode & electrified_cells)
+        if not numpy.any(cells_hit & ~cells_to_explode):
+            break
+        cells_to_explode |= get_cells_of_marked_blocks(cells, cells_hit)
+    cells_hit_by_electrified = get_cells_adjacent_vertically(cells, cells_to_explode & electrified_cells)
+    order_dependent = numpy.any(cells_hit_by_electrified & (cells[..., CELL_TYPE] == Block.FRAGILE), axis=(1, 2))
+    return (cells_to_explode, order_dependent)
+
+
+def let_all_blocks_fall(cells):
+    """
+        Let all the blocks on all the boards in the given batch fall down until
+        none of them is still airborne.
+        - Blocks are handled row by row from the bottom up, in the same way as
+          Board.let_all_blocks_fall does.
+        ASSUMPTIONS
+        - The given array represents a batch of boards.
+    """
+    nb_boards, nb_rows, nb_columns, _ = numpy.shape(cells)
+    max_length = int(numpy.max(cells[..., CELL_LENGTH], initial=1))
+    # The number of the highest occupied row below the row being handled for
+    # each column of each board (0 if no cell in that column is occupied).
+    highest_occupied_rows = numpy.where(cells[:, 0, :, CELL_ID] != 0, 1, 0)
+    for row_index in range(1, nb_rows):
+        block_ids = cells[:, row_index, :, CELL_ID]
+        occupied_cells = block_ids != 0
+        if not numpy.any(occupied_cells):
+            continue
+        # Each block lands just above the highest occupied row below any of its cells.
+        new_row_nbs = numpy.where(occupied_cells, highest_occupied_rows, 0)
+        for distance in range(1, max_length):
+            same_block = occupied_cells[:, distance:] & (block_ids[:, distance:] == block_ids[:, :-distance])
+            from_left = numpy.where(same_block, new_row_nbs[:, :-distance], 0)
+            from_right = numpy.where(same_block, new_row_nbs[:, distance:], 0)
+            new_row_nbs[:, distance:] = numpy.maximum(new_row_nbs[:, distance:], from_left)
+            new_row_nbs[:, :-distance] = numpy.maximum(new_row_nbs[:, :-distance], from_right)
+        new_row_nbs += 1
+        boards_to_move, columns_to_move = numpy.nonzero(occupied_cells & (new_row_nbs <= row_index))
+        if len(boards_to_move) > 0:
+            cells[boards_to_move, new_row_nbs[boards_to_move, columns_to_move] - 1, columns_to_move] = \
+                cells[boards_to_move, row_index, columns_to_move]
+            cells[boards_to_move, row_index, columns_to_move] = 0
+        highest_occupied_rows = numpy.where(occupied_cells, new_row_nbs, highest_occupied_rows)
+
+
+def let_all_full_rows_explode(cells, full_rows, next_block_id):
+    """
+        Let all the blocks in all the full rows on all the boards in the given batch
+        explode, and return the scores resulting from all explosions.
+        - The given full rows are a NumPy array of booleans marking the rows that are
+          completely filled on each board.
+        - The resulting scores are collected in a NumPy array with an element for
+          each board in the batch.
+        - Blocks explode in the same way as Game.let_all_full_rows_explode lets
+          them explode. Chain reactions of electrified blocks are worked out for all
+          boards at once (see get_cells_to_explode). Only boards on which the outcome
+          depends on the order of explosions are handled one by one by
+          Game.let_all_full_rows_explode itself.
+        - The blocks replacing fragile blocks get identifications starting from
+          the given identification.
+        ASSUMPTIONS
+        - The given array represents a batch of boards.
+        - The given identification exceeds the identification of all blocks in the
+          given batch.
+    """
+    import Game
+    nb_boards, nb_rows, nb_columns, _ = numpy.shape(cells)
+    scores = numpy.zeros(nb_boards, dtype=numpy.int64)
+    cells_to_explode, order_dependent = get_cells_to_explode(cells, full_rows)
+    for board_index in numpy.flatnonzero(order_dependent):
+        board = array_to_board(cells[board_index])
+        scores[board_index] = Game.let_all_full_rows_explode(board)
+        cells[board_index] = board_to_array(board)
+    cells_to_explode &= ~order_dependent[:, numpy.newaxis, numpy.newaxis]
+    # Ordinary blocks score their length; fragile blocks score twice their length.
+    leftmost_cells = get_leftmost_cells(cells) & cells_to_explode
+    fragile_cells = cells_to_explode & (cells[..., CELL_TYPE] == Block.FRAGILE)
+    points = numpy.where(fragile_cells, 2, 1) * cells[..., CELL_LENGTH]
+    scores += numpy.sum(numpy.where(leftmost_cells, points, 0), axis=(1, 2))
+    # The offset of each cell relative to the leftmost cell of its block.
+    offsets = numpy.zeros((nb_boards, nb_rows, nb_columns), dtype=numpy.int64)
+    for column_index in range(1, nb_columns):
+        offsets[..., column_index] = numpy.where(leftmost_cells[..., column_index] |
+                                                 ~cells_to_explode[..., column_index],
+                                                 0, offsets[..., column_index - 1] + 1)
+    lengths = cells[..., CELL_LENGTH]
+    first_lengths = (lengths + 1) // 2
+    in_second_block = offsets >= first_lengths
+    new_lengths = numpy.where(in_second_block, lengths // 2, first_lengths)
+    new_types = numpy.where(new_lengths % 2 == 1, Block.ORDINARY, Block.FRAGILE)
+    # Replacing blocks are identified by the cell index of the fragile block.
+    cell_indices = numpy.arange(nb_rows)[:, numpy.newaxis] * nb_columns + numpy.arange(nb_columns)
+    new_ids = next_block_id + 2 * (cell_indices - offsets) + in_second_block
+    cells[fragile_cells, CELL_ID] = new_ids[fragile_cells]
+    cells[fragile_cells, CELL_LENGTH] = new_lengths[fragile_cells]
+    cells[fragile_cells, CELL_TYPE] = new_types[fragile_cells]
+    cells[cells_to_explode & ~fragile_cells] = 0
+    return scores
+
+
+def stabilize_batch(cells, levels, scores):
+    """
+        Stabilize all the boards in the given batch in view of the given levels and
+        the given scores.
+        - The given levels and the given scores are NumPy arrays with an element for
+          each board in the batch. They are updated in the same way as
+          Game.stabilize_board updates the level and the score for a single board.
+        ASSUMPTIONS
+        - The given array represents a batch of boards.
+        - The given levels are positive integer numbers, and the given scores are
+          non-negative integer numbers.
+    """
+    import Game
+    nb_columns = numpy.shape(cells)[2]
+    let_all_blocks_fall(cells)
+    # Only boards with full rows are involved in the next round of explosions.
+    full_rows = numpy.all(cells[..., CELL_ID] != 0, axis=2)
+    active_boards = numpy.flatnonzero(numpy.any(full_rows, axis=1))
+    full_rows = full_rows[active_boards]
+    while len(active_boards) > 0:
+        active_cells = cells[active_boards]
+        next_block_id = int(numpy.max(active_cells[..., CELL_ID])) + 1
+        scores_from_explosions = let_all_full_rows_explode(active_cells, full_rows, next_block_id)
+        nb_full_rows = numpy.sum(full_rows, axis=1)
+        for index in range(0, len(active_boards)):
+            board_index = active_boards[index]
+            scores[board_index], levels[board_index] = \
+                Game.adjust_score(int(scores[board_index]), int(levels[board_index]),
+                                  int(scores_from_explosions[index]), int(nb_full_rows[index]), nb_columns)
+        let_all_blocks_fall(active_cells)
+        cells[active_boards] = active_cells
+        full_rows = numpy.all(active_cells[..., CELL_ID] != 0, axis=2)
+        still_active = numpy.any(full_rows, axis=1)
+        active_boards = active_boards[still_active]
+        full_rows = full_rows[still_active]
+
+
+def get_scores_of_moves(board, level, score, moves):
+    """
+        Return a NumPy array with the score resulting from each of the given moves
+        on the given board, in view of the given level and the given score.
+        - The given moves are collected in a sequence of tuples consisting of a block
+          to move followed by the distance to move it over.
+        - The score for a move is the score Game.stabilize_board returns after that
+          move has been made on the given board.
+        - The given board is not changed.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - The given level is a positive integer number.
+        - The given score is a non-negative integer number.
+        - Each block in the given moves is loaded on the given board, and can move
+          over the distance associated with it.
+    """
+    cells = make_batch_of_moves(board, moves)
+    levels = numpy.full(len(moves), level, dtype=numpy.int64)
+    scores = numpy.full(len(moves), score, dtype=numpy.int64)
+    stabilize_batch(cells, levels, scores)
+    return scores
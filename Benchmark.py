@@ -0,0 +1,268 @@
+# The benchmark suite measures the time taken by primitive operations on boards
+# and by the functions playing the game, on seeded boards of several sizes and
+# densities. The results are saved in JSON format, together with the commit they
+# have been measured on, such that runs on different commits can be compared.
+import Dimension
+import Position
+import Board
+import Game
+import Simulation
+
+# Dimensions of the boards to benchmark on.
+ALL_DIMENSIONS = ((8, 7), (8, 10), (16, 20), (26, 40))
+
+# Fractions of the rows below the overflow row that are filled with blocks.
+ALL_DENSITIES = (0.25, 0.5, 0.75)
+
+# The search for top moves only runs on boards with at most this number of cells.
+MAX_NB_CELLS_FOR_TOP_MOVES = 100
+
+
+def make_seeded_board(dimension, density, seed):
+    """
+        Return a new board with the given dimension, of which the given fraction of
+        the rows below the overflow row are filled with random blocks generated from
+        the given seed.
+        - Each row is filled in the same way as Board.fill_bottom_row fills the
+          bottom row, using the default maximum block length of the simulation
+          harness (see Simulation.get_default_max_block_length). No row is full.
+        - Blocks are added to the rows from the bottom up, without letting them
+          fall. The resulting board is therefore in general not stable.
+        - The same seed always yields a board in the same state.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension with at least 4 columns.
+        - The given density is a number between 0 and 1.
+    """
+    nb_rows_to_fill = round(density * (Dimension.get_nb_of_rows(dimension) - 1))
+    all_blocks = Simulation.make_random_blocks(dimension, nb_rows_to_fill,
+                                               Simulation.get_default_max_block_length(dimension), seed)
+    board = Board.make_board(dimension)
+    for row_nb in range(1, nb_rows_to_fill + 1):
+        row = Position.id_of_row(dimension, row_nb)
+        for (position, block) in all_blocks[row_nb - 1]:
+            Board.add_block_at(board, block, (row, Position.get_column(position)))
+    return board
+
+
+def make_stable_board(dimension, density, seed):
+    """
+        Return a new board in the state of the board returned by make_seeded_board
+        for the given arguments, after it has been stabilized.
+        ASSUMPTIONS
+        - The given arguments satisfy all the assumptions of make_seeded_board.
+    """
+    board = make_seeded_board(dimension, density, seed)
+    Game.stabilize_board(1, 0, board)
+    return board
+
+
+def time_operation(operation, make_arguments, nb_repetitions):
+    """
+        Return a dictionary with the times in seconds it takes to apply the given
+        operation to arguments returned by the given function, repeated the given
+        number of times.
+        - The given function is called without arguments before each repetition,
+          and must return a tuple of arguments. Its own time is not measured.
+        - The resulting dictionary maps "min", "median" and "mean" to the minimal, the
+          median and the average time of a single repetition, and "nb_repetitions"
+          to the given number of repetitions.
+        ASSUMPTIONS
+        - The given number of repetitions is a positive integer number.
+    """
+    import statistics
+    import time
+    times = []
+    for _ in range(0, nb_repetitions):
+        arguments = make_arguments()
+        start_time = time.perf_counter()
+        operation(*arguments)
+        list.append(times, time.perf_counter() - start_time)
+    return {"min": min(times), "median": statistics.median(times), "mean": statistics.mean(times),
+            "nb_repetitions": nb_repetitions}
+
+
+def get_all_blocks_at(board):
+    """
+        Look up the block at each position on the given board.
+    """
+    dimension = Board.get_dimension(board)
+    for row_nb in range(1, Dimension.get_nb_of_rows(dimension) + 1):
+        row = Position.id_of_row(dimension, row_nb)
+        for column in range(1, Dimension.get_nb_of_columns(dimension) + 1):
+            Board.get_block_at(board, (row, column))
+
+
+def get_all_leftmost_positions(board, blocks):
+    """
+        Look up the leftmost position of each of the given blocks on the given board.
+    """
+    for block in blocks:
+        Board.get_leftmost_position_of(board, block)
+
+
+def check_all_moves(board, blocks):
+    """
+        Check for each of the given blocks on the given board whether it can move
+        over each distance up to the number of columns of the board, in both directions.
+    """
+    nb_columns = Dimension.get_nb_of_columns(Board.get_dimension(board))
+    for block in blocks:
+        for nb_steps in range(-nb_columns, nb_columns + 1):
+            Board.can_move_over(board, block, nb_steps)
+
+
+def let_bottom_row_explode(board):
+    """
+        Let all the blocks in the bottom row of the given board explode.
+    """
+    for block in Board.get_all_blocks_in_row(board, "a"):
+        if Board.contains_block(board, block):
+            Board.let_explode(board, block)
+
+
+def search_all_top_moves(board, blocks):
+    """
+        Search for top moves on the given board using the given blocks, exploring
+        all sequences of at most 2 moves.
+        - The minimal score cannot be reached, and branch and bound is switched off,
+          such that the search is never cut short.
+    """
+    Game.get_top_moves(board, blocks, min_score=10 ** 9, max_nb_moves=2, branch_and_bound=False)
+
+
+def get_all_benchmarks(dimension, density, seed):
+    """
+        Return a list of tuples consisting of the name of a benchmark, followed by
+        the operation to time, followed by a function returning the arguments to
+        apply that operation to, for the given dimension, density and seed.
+        - Operations changing their arguments get new arguments in each repetition.
+        - The search for top moves is only included for boards with no more cells
+          than MAX_NB_CELLS_FOR_TOP_MOVES.
+        ASSUMPTIONS
+        - The given arguments satisfy all the assumptions of make_seeded_board.
+    """
+    stable_board = make_stable_board(dimension, density, seed)
+    all_blocks = Board.get_all_blocks(stable_board)
+    nb_rows_to_fill = Dimension.get_nb_of_rows(dimension)
+    max_block_length = Simulation.get_default_max_block_length(dimension)
+    benchmarks = [
+        ("Board.get_block_at", get_all_blocks_at, lambda: (stable_board,)),
+        ("Board.get_leftmost_position_of", get_all_leftmost_positions, lambda: (stable_board, all_blocks)),
+        ("Board.can_move_over", check_all_moves, lambda: (stable_board, all_blocks)),
+        ("Board.let_all_blocks_fall", Board.let_all_blocks_fall,
+         lambda: (make_seeded_board(dimension, density, seed),)),
+        ("Board.let_explode", let_bottom_row_explode, lambda: (Board.copy_board(stable_board),)),
+        ("Game.stabilize_board", Game.stabilize_board,
+         lambda: (1, 0, make_seeded_board(dimension, density, seed))),
+        ("Game.get_move_with_highest_score", Game.get_move_with_highest_score, lambda: (stable_board, 1, 0)),
+        ("Game.play_greedy", Game.play_greedy,
+         lambda: (Simulation.make_random_blocks(dimension, nb_rows_to_fill, max_block_length, seed), dimension))]
+    if Dimension.get_nb_of_rows(dimension) * Dimension.get_nb_of_columns(dimension) <= MAX_NB_CELLS_FOR_TOP_MOVES:
+        list.append(benchmarks,
+                    ("Game.get_top_moves", search_all_top_moves,
+                     lambda: (stable_board, Simulation.make_random_blocks(dimension, 2, max_block_length, seed))))
+    return benchmarks
+
+
+def get_commit():
+    """
+        Return the identification of the commit checked out in the directory of
+        this module, followed by a plus sign if there are uncommitted changes.
+        - None is returned if that identification cannot be determined.
+    """
+    import os
+    import subprocess
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=directory, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=directory,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + "+" if len(changes) > 0 else commit
+
+
+def run_benchmarks(dimensions=ALL_DIMENSIONS, densities=ALL_DENSITIES, seed=0, nb_repetitions=5,
+                   benchmark_names=None):
+    """
+        Run all the benchmarks for each of the given dimensions and each of the given
+        densities on boards generated from the given seed, and return a dictionary
+        with the results.
+        - The resulting dictionary maps "commit" to the commit the benchmarks ran on
+          (see get_commit), "python" to the version of Python, "platform" to a
+          description of the platform, "seed" to the given seed, and "results" to a
+          list with a dictionary for each benchmark. The latter dictionaries map
+          "benchmark" to the name of the benchmark, "dimension" to the dimension,
+          "density" to the density, and hold the times as described for time_operation.
+        - If names of benchmarks are given, only benchmarks with those names are run.
+        ASSUMPTIONS
+        - The given dimensions and densities satisfy all the assumptions of
+          make_seeded_board.
+        - The given number of repetitions is a positive integer number.
+    """
+    import platform
+    results = []
+    for dimension in dimensions:
+        for density in densities:
+            for (name, operation, make_arguments) in get_all_benchmarks(dimension, density, seed):
+                if (benchmark_names is not None) and (name not in benchmark_names):
+                    continue
+                result = {"benchmark": name, "dimension": list(dimension), "density": density}
+                dict.update(result, time_operation(operation, make_arguments, nb_repetitions))
+                list.append(results, result)
+    return {"commit": get_commit(), "python": platform.python_version(), "platform": platform.platform(),
+            "seed": seed, "results": results}
+
+
+def save_results(results, path):
+    """
+        Save the given results of run_benchmarks in JSON format in the file at the
+        given path.
+    """
+    import json
+    with open(path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+
+
+def compare_results(old_results, new_results):
+    """
+        Return a list of tuples comparing the given results of run_benchmarks for
+        benchmarks present in both of them.
+        - Each tuple consists of the name of the benchmark, the dimension, the density,
+          the old and the new median time, followed by the ratio of the new median time
+          to the old median time.
+    """
+    old_times = {(result["benchmark"], tuple(result["dimension"]), result["density"]): result["median"]
+                 for result in old_results["results"]}
+    comparison = []
+    for result in new_results["results"]:
+        key = (result["benchmark"], tuple(result["dimension"]), result["density"])
+        if key in old_times:
+            old_time = old_times[key]
+            list.append(comparison, key + (old_time, result["median"],
+                                           result["median"] / old_time if old_time > 0 else None))
+    return comparison
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Benchmark board primitives and game solvers.")
+    parser.add_argument("output_path", help="path of the JSON file to write the results to")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--nb-repetitions", type=int, default=5)
+    parser.add_argument("--benchmark", action="append", dest="benchmark_names",
+                        help="name of a benchmark to run (all benchmarks if omitted)")
+    parser.add_argument("--baseline", help="path of earlier results to compare with")
+    arguments = parser.parse_args()
+    results = run_benchmarks(seed=arguments.seed, nb_repetitions=arguments.nb_repetitions,
+                             benchmark_names=arguments.benchmark_names)
+    save_results(results, arguments.output_path)
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        for (name, dimension, density, old_time, new_time, ratio) in compare_results(baseline, results):
+            print("%-36s %-9s %4.2f %10.6f %10.6f %s" %
+                  (name, "%dx%d" % dimension, density, old_time, new_time,
+                   "-" if ratio is None else "%.2f" % ratio))
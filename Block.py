@@ -1,22 +1,59 @@
+import functools
+import itertools
 import Color
 import Dimension
-import Position
 
 ORDINARY    = 1
 ELECTRIFIED = 2
 FRAGILE     = 3
 
+# Serial numbers for new blocks. Serial numbers only distinguish blocks made in
+# the same process: blocks made in different processes (such as the workers of a
+# parallel search) may have the same serial number.
+serial_numbers = itertools.count(1)
+
+
+@functools.total_ordering
+class Block:
+    """
+      A block with a length, a type and a color, and a serial number.
+      - Blocks are equal only to themselves, and hash by identity. Different blocks
+        with the same length, type and color can therefore be stored in the same
+        set or used as different keys in the same dictionary.
+      - Blocks are ordered by their length, their type and their color, and by
+        their serial number if these are equal. Different blocks made in the same
+        process are therefore never equivalent in that order.
+    """
+    __slots__ = ("length", "type", "color", "serial")
+
+    def __init__(self, length, type, color):
+        self.length = length
+        self.type = type
+        self.color = color
+        self.serial = next(serial_numbers)
+
+    def __lt__(self, other):
+        if not isinstance(other, Block):
+            return NotImplemented
+        return (self.length, self.type, self.color, self.serial) < \
+               (other.length, other.type, other.color, other.serial)
+
+    def __repr__(self):
+        return "Block(%r, %r, %r, serial=%r)" % (self.length, self.type, self.color, self.serial)
+
 
 def make_block(length, type=ORDINARY, color = Color.BLACK):
     """
-      Return a block of the given length, of the given type and with the given
+      Return a new block of the given length, of the given type and with the given
       color.
+      - Each new block gets a serial number that is higher than the serial number
+        of all blocks made before in the same process.
       ASSUMPTIONS
       - The given length is a positive integer number.
       - The given type is either ORDINARY, ELECTRIFIED or FRAGILE.
       - The given color is a proper color.
     """
-    return (length,type,color)
+    return Block(length,type,color)
 
 
 def is_proper_block(block):
@@ -27,11 +64,9 @@ def is_proper_block(block):
       ASSUMPTIONS
       - None
     """
-    if not isinstance(block,tuple):
+    if not isinstance(block,Block):
         return False
-    if len(block) != 3:
-        return False
-    length, type, color = block
+    length, type, color = block.length, block.type, block.color
     if not isinstance(length,int):
         return False
     if length <= 0:
@@ -104,7 +139,7 @@ def get_length(block):
       ASSUMPTIONS
       - The given block is a proper block
     """
-    return block[0]
+    return block.length
 
 
 def get_type(block):
@@ -113,7 +148,7 @@ def get_type(block):
       ASSUMPTIONS
       - The given block is a proper block
     """
-    return block[1]
+    return block.type
 
 
 def get_color(block):
@@ -122,7 +157,16 @@ def get_color(block):
       ASSUMPTIONS
       - The given block is a proper block
     """
-    return block[2]
+    return block.color
+
+
+def get_serial(block):
+    """
+      Return the serial number of the given block.
+      ASSUMPTIONS
+      - The given block is a proper block
+    """
+    return block.serial
 
 
 def get_symbol(block):
@@ -1,7 +1,9 @@
+import bisect
 import Color
 import Dimension
 import Position
 import Block
+import Instrumentation
 
 
 def is_proper_board(board):
@@ -17,58 +19,151 @@ def is_proper_board(board):
     """
     if not isinstance(board, tuple):
         return False
-    if len(board) != 2:
+    if len(board) != 10:
         return False
-    dimension, blocks = board
+    dimension, cells, positions, row_masks, rows, undo_log, checkpoints, state_hash, changed_rows, support = board
     if not Dimension.is_proper_dimension(dimension):
         return False
-    if not isinstance(blocks, dict):
-        return False;
-    for position in dict.keys(blocks):
-        # Each position must be a proper position
-        if not Position.is_within_boundaries(dimension, position):
+    if not isinstance(cells, list):
+        return False
+    if len(cells) != Dimension.get_nb_of_rows(dimension) * Dimension.get_nb_of_columns(dimension):
+        return False
+    if not isinstance(positions, dict):
+        return False
+    if (not isinstance(row_masks, list)) or (len(row_masks) != Dimension.get_nb_of_rows(dimension)):
+        return False
+    nb_columns = Dimension.get_nb_of_columns(dimension)
+    for row_index in range(0, len(row_masks)):
+        # The occupancy mask of each row must reflect the cells of that row.
+        row_mask = 0
+        for column_index in range(0, nb_columns):
+            if cells[row_index * nb_columns + column_index] is not None:
+                row_mask |= 1 << column_index
+        if row_masks[row_index] != row_mask:
             return False
+    if (not isinstance(rows, list)) or (len(rows) != Dimension.get_nb_of_rows(dimension)):
+        return False
+    if (not isinstance(undo_log, list)) or (not isinstance(checkpoints, list)):
+        return False
+    if (not isinstance(state_hash, list)) or (len(state_hash) != 1):
+        return False
+    if not isinstance(changed_rows, set):
+        return False
+    if (not isinstance(support, dict)) or (len(support) != len(positions)):
+        return False
+    expected_hash = get_zobrist_keys(dimension)[0]
+    nb_blocks = 0
+    for index in range(0, len(cells)):
+        block = cells[index]
+        if block is None:
+            continue
         # Each block must be a proper block for the dimension of the given board.
-        block = dict.get(blocks, position)
         if not Block.is_proper_block_for_dimension(block, dimension):
             return False
+        position = Position.position_of_cell(dimension, index)
         left_position = Position.left(dimension, position)
         # Each block must occupy a contiguous sequence of cells of a single
         # row. The length of that sequence must be equal to the length of
         # the block.
         # This check is only done for the leftmost position of the block.
-        if (left_position is None) or \
-                (left_position not in blocks) or \
-                (dict.get(blocks, left_position) is not block):
+        if (left_position is None) or (cells[index - 1] is not block):
+            # The leftmost position of each block must be registered.
+            if dict.get(positions, block) != position:
+                return False
+            nb_blocks += 1
+            expected_hash ^= get_zobrist_key_of(dimension, block, position)
+            # The block must be registered in its row in the order of the columns.
+            row_blocks = rows[Position.nb_of_row(dimension, Position.get_row(position)) - 1]
+            row_index = bisect.bisect_left(row_blocks, (Position.get_column(position),))
+            if (row_index == len(row_blocks)) or (row_blocks[row_index][1] is not block):
+                return False
             next_position = Position.right(dimension, position)
             for nb_cells in range(1, Block.get_length(block)):
-                if dict.get(blocks, next_position, None) is not block:
+                if (next_position is None) or \
+                        (cells[Position.cell_index(dimension, next_position)] is not block):
                     return False
                 next_position = Position.right(dimension, next_position)
             if (next_position is not None) and \
-                    (dict.get(blocks, next_position, None) is block):
+                    (cells[Position.cell_index(dimension, next_position)] is block):
                 return False
-    return True
+            # The blocks directly above and below the block must be registered.
+            if dict.get(support, block) != get_blocks_adjacent_in_cells(dimension, cells, block, index):
+                return False
+    # No blocks may be registered that are not on the board.
+    if sum(len(row_blocks) for row_blocks in rows) != nb_blocks:
+        return False
+    if state_hash[0] != expected_hash:
+        return False
+    return len(positions) == nb_blocks
 
 
 def make_board(dimension):
     """
         Return a new board of the given dimension without any blocks yet.
+        - The cells of the board are stored row by row in a flat list, starting
+          with the bottom row. Each element of that list is the block occupying
+          the cell, or None if the cell is free.
+        - The leftmost position of each block on the board is registered in a
+          dictionary keyed by the block (blocks hash by identity).
+        - The occupancy of each row is registered in an integer number, whose
+          bit at index c-1 is set if and only if the cell in column c is occupied.
+        - The blocks in each row are registered in a list of tuples consisting of
+          the leftmost column of the block followed by the block itself, sorted
+          in ascending order of the columns.
+        - While checkpoints are set on the board, each addition and removal of a
+          block is registered in an undo log (see set_checkpoint).
+        - A hash of the state of the board is maintained in a list with a single
+          element (see get_state_hash).
+        - The rows in which blocks have been added or removed since the board was
+          last stabilized are registered in a set (see take_changed_rows).
+        - The blocks directly above and directly below each block are registered
+          in a dictionary keyed by the block (see get_blocks_adjacent_in_cells).
         ASSUMPTIONS
         - The given dimension is a proper dimension.
     """
-    return (dimension, {})
+    nb_rows = Dimension.get_nb_of_rows(dimension)
+    nb_columns = Dimension.get_nb_of_columns(dimension)
+    return (dimension, [None] * (nb_rows * nb_columns), {}, [0] * nb_rows,
+            [[] for row_index in range(0, nb_rows)], [], [], [get_zobrist_keys(dimension)[0]], set(), {})
 
 
 def copy_board(board):
     """
         Return a copy of the given board loaded with copies of the blocks on
         the given board.
+        - The copy has no checkpoints and an empty undo log.
         ASSUMPTIONS
         - The given board is a proper board.
     """
-    import copy
-    return (board[0], copy.copy(board[1]))
+    return (get_dimension(board), get_cells(board)[:], dict.copy(get_leftmost_positions(board)),
+            get_row_masks(board)[:], [row_blocks[:] for row_blocks in get_row_registrations(board)], [], [],
+            [get_state_hash(board)], set.copy(get_changed_rows(board)),
+            {block: (set.copy(blocks_above), set.copy(blocks_below))
+             for (block, (blocks_above, blocks_below)) in get_support_graph(board).items()})
+
+
+def get_blocks_adjacent_in_cells(dimension, cells, block, index):
+    """
+        Return a tuple consisting of the set of blocks directly above the given block,
+        followed by the set of blocks directly below the given block, in the given
+        cells of a board with the given dimension.
+        - The given block occupies the cells starting from the given index. A block
+          is directly above (below) the given block if it occupies at least one of the
+          cells in the row above (below) the cells occupied by the given block.
+        ASSUMPTIONS
+        - The given cells are the cells of a board with the given dimension.
+        - The given block occupies the cells starting from the given index.
+    """
+    nb_columns = Dimension.get_nb_of_columns(dimension)
+    length = Block.get_length(block)
+    blocks_above, blocks_below = set(), set()
+    if index + nb_columns < len(cells):
+        blocks_above = set(cells[index + nb_columns:index + nb_columns + length])
+        set.discard(blocks_above, None)
+    if index >= nb_columns:
+        blocks_below = set(cells[index - nb_columns:index - nb_columns + length])
+        set.discard(blocks_below, None)
+    return (blocks_above, blocks_below)
 
 
 def get_dimension(board):
@@ -80,6 +175,221 @@ def get_dimension(board):
     return board[0]
 
 
+def get_cells(board):
+    """
+        Return the list of the cells of the given board, stored row by row starting
+        with the bottom row (see make_board).
+        - The resulting list is the list of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[1]
+
+
+def get_leftmost_positions(board):
+    """
+        Return the dictionary mapping each block on the given board to its leftmost
+        position.
+        - The resulting dictionary is the dictionary of the board itself. It must only
+          be changed by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[2]
+
+
+def get_row_masks(board):
+    """
+        Return the list of the occupancy masks of the rows of the given board, the
+        mask of the bottom row first (see get_occupancy_of_row).
+        - The resulting list is the list of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[3]
+
+
+def get_row_registrations(board):
+    """
+        Return the list of the registrations of the blocks in the rows of the given
+        board, the registration of the bottom row first. The registration of a row is
+        a list of tuples consisting of the leftmost column of a block in that row
+        followed by the block itself, sorted in ascending order of the columns.
+        - The resulting list is the list of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[4]
+
+
+def get_undo_log(board):
+    """
+        Return the undo log of the given board (see set_checkpoint).
+        - The resulting list is the list of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[5]
+
+
+def get_checkpoints(board):
+    """
+        Return the list of the checkpoints set on the given board, the most recent
+        checkpoint last. Each checkpoint is the length of the undo log at the time
+        it was set.
+        - The resulting list is the list of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[6]
+
+
+def update_state_hash(board, key):
+    """
+        Combine the given key into the hash of the state of the given board by means
+        of an exclusive or (see get_state_hash).
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - The given key is a Zobrist key for the given board (see get_zobrist_key_of).
+    """
+    board[7][0] ^= key
+
+
+def get_changed_rows(board):
+    """
+        Return the set of the letters of the rows of the given board in which blocks
+        have been added or removed since the board was last stabilized (see
+        take_changed_rows).
+        - The resulting set is the set of the board itself. It must only be changed
+          by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[8]
+
+
+def get_support_graph(board):
+    """
+        Return the dictionary mapping each block on the given board to a tuple
+        consisting of the set of blocks directly above it, followed by the set of
+        blocks directly below it (see get_blocks_adjacent_in_cells).
+        - The resulting dictionary is the dictionary of the board itself. It must only
+          be changed by functions of this module.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[9]
+
+
+# Random keys for Zobrist hashing, computed once for each dimension.
+zobrist_keys_per_dimension = {}
+
+
+def get_zobrist_keys(dimension):
+    """
+        Return the random keys used to hash the state of boards with the given
+        dimension.
+        - The function returns a tuple consisting of the hash of an empty board,
+          followed by a list of keys for the leftmost cell of a block, a list of
+          dictionaries of keys for block lengths, a list of dictionaries of keys
+          for block types and a list of dictionaries of keys for block colors.
+          Each of these lists has an element for each cell index (see
+          Position.cell_index).
+        - The keys only depend on the given dimension. They are computed the first
+          time they are requested, and reused afterwards.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+    """
+    keys = dict.get(zobrist_keys_per_dimension, dimension, None)
+    if keys is None:
+        import random
+        nb_rows = Dimension.get_nb_of_rows(dimension)
+        nb_columns = Dimension.get_nb_of_columns(dimension)
+        generator = random.Random(nb_rows * 1000003 + nb_columns)
+        nb_cells = nb_rows * nb_columns
+        keys = (generator.getrandbits(64),
+                [generator.getrandbits(64) for index in range(0, nb_cells)],
+                [{length: generator.getrandbits(64) for length in range(1, nb_columns + 1)}
+                 for index in range(0, nb_cells)],
+                [{type: generator.getrandbits(64) for type in (Block.ORDINARY, Block.ELECTRIFIED, Block.FRAGILE)}
+                 for index in range(0, nb_cells)],
+                [{color: generator.getrandbits(64) for color in Color.ALL_COLORS}
+                 for index in range(0, nb_cells)])
+        zobrist_keys_per_dimension[dimension] = keys
+    return keys
+
+
+def get_zobrist_key_of(dimension, block, position):
+    """
+        Return the contribution to the hash of the state of a board with the
+        given dimension of the given block positioned at the given position.
+        - The contribution combines the length, the type and the color of the
+          block in each of its cells, together with the position of its leftmost
+          cell.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given block is a proper block for the given dimension.
+        - The given position is within the boundaries of the given dimension, and
+          the given block fits in its row starting from the given position.
+    """
+    _, leftmost_keys, length_keys, type_keys, color_keys = get_zobrist_keys(dimension)
+    length, type, color = Block.get_length(block), Block.get_type(block), Block.get_color(block)
+    index = Position.cell_index(dimension, position)
+    key = leftmost_keys[index]
+    for index in range(index, index + length):
+        key ^= length_keys[index][length] ^ type_keys[index][type] ^ color_keys[index][color]
+    return key
+
+
+def get_state_hash(board):
+    """
+        Return a 64-bit hash of the state of the given board.
+        - Boards with the same dimension on which blocks of the same length, type
+          and color occupy the same cells have the same hash, regardless of the
+          identity of those blocks.
+        - The hash is maintained incrementally each time a block is added to or
+          removed from the board.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return board[7][0]
+
+
+def take_changed_rows(board):
+    """
+        Return a frozen set of the letters of all the rows of the given board in
+        which blocks have been added or removed since the previous call of this
+        function for the given board (or since the board was made).
+        - The function clears the registration of changed rows on the given board.
+        - The function is used to stabilize boards incrementally. Stabilizing a
+          board takes the changed rows. Any row that has not changed since then
+          is still stable, and is not completely filled.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    changed_rows = frozenset(get_changed_rows(board))
+    set.clear(get_changed_rows(board))
+    return changed_rows
+
+
+def get_occupancy_of_row(board, row):
+    """
+        Return an integer number registering the occupied cells in the given row
+        of the given board.
+        - The bit at index c-1 of the resulting number is set if and only if the
+          cell in column c of the given row is occupied by some block.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - The given row is within the range of the given board.
+    """
+    return get_row_masks(board)[Position.nb_of_row(get_dimension(board), row) - 1]
+
+
 def get_block_at(board, position):
     """
         Return the block occupying the given position of the given board.
@@ -90,10 +400,11 @@ def get_block_at(board, position):
         - The given board is a proper board.
         - The given position is a proper position.
     """
-    if not Position.is_within_boundaries(get_dimension(board), position):
+    # The table of positions holds exactly the positions within the boundaries.
+    index = dict.get(Position.get_position_table(get_dimension(board))[1], position, None)
+    if index is None:
         return None
-    _, cells = board
-    return dict.get(cells, position, None)
+    return get_cells(board)[index]
 
 
 def is_free_at(board, position):
@@ -118,22 +429,7 @@ def get_leftmost_position_of(board, block):
         - The given board is a proper board.
         - The given block is a proper block for the dimension of the given board.
     """
-    current_position = ("a", 1)
-    while current_position is not None:
-        current_block = get_block_at(board, current_position)
-        if current_block is block:
-            return current_position
-        elif current_block is None:
-            step = 1
-        else:
-            step = Block.get_length(current_block)
-        next_position = Position.right(get_dimension(board), current_position, step)
-        if next_position is not None:
-            current_position = next_position
-        else:
-            current_position = \
-                Position.up(get_dimension(board), (Position.get_row(current_position), 1), 1)
-    return None
+    return dict.get(get_leftmost_positions(board), block, None)
 
 
 def get_all_positions_of(board, block):
@@ -185,17 +481,8 @@ def get_all_blocks_in_row(board, row):
         - The given board is a proper board.
         - The given row is within the boundaries of the given board.
     """
-    result = []
-    current_position = (row, 1)
-    while current_position is not None:
-        block_at_position = get_block_at(board, current_position)
-        if (block_at_position is not None):
-            list.append(result, block_at_position)
-            nb_steps = Block.get_length(block_at_position)
-        else:
-            nb_steps = 1
-        current_position = Position.right(get_dimension(board), current_position, nb_steps)
-    return result
+    row_blocks = get_row_registrations(board)[Position.nb_of_row(get_dimension(board), row) - 1]
+    return [block for (_, block) in row_blocks]
 
 
 def get_length_largest_gap_in_row(board, row):
@@ -206,23 +493,14 @@ def get_length_largest_gap_in_row(board, row):
         - The given board is a proper board.
         - The given row is within the range of the given board.
     """
-    length_largest_gap_so_far = 0
-    length_current_gap = 0
-    current_position = (row, 1)
-    while current_position is not None:
-        if is_free_at(board, current_position):
-            length_current_gap += 1
-            current_position = Position.right(get_dimension(board), current_position)
-        else:
-            if length_current_gap > length_largest_gap_so_far:
-                length_largest_gap_so_far = length_current_gap
-            length_current_gap = 0
-            length_current_block = Block.get_length(get_block_at(board, current_position))
-            current_position = \
-                Position.right(get_dimension(board), current_position, length_current_block)
-    if length_current_gap > length_largest_gap_so_far:
-        length_largest_gap_so_far = length_current_gap
-    return length_largest_gap_so_far
+    nb_columns = Dimension.get_nb_of_columns(get_dimension(board))
+    free_cells = ~get_occupancy_of_row(board, row) & ((1 << nb_columns) - 1)
+    # Each step shortens all runs of free cells by one cell.
+    length_largest_gap = 0
+    while free_cells != 0:
+        free_cells &= free_cells >> 1
+        length_largest_gap += 1
+    return length_largest_gap
 
 
 def is_empty_row(board, row):
@@ -233,7 +511,7 @@ def is_empty_row(board, row):
         - The given board is a proper board.
         - The given row is within the range of the given board.
     """
-    return get_all_blocks_in_row(board, row) == []
+    return get_occupancy_of_row(board, row) == 0
 
 
 def is_full_row(board, row):
@@ -244,15 +522,8 @@ def is_full_row(board, row):
         - The given board is a proper board.
         - The given row is within the range of the given board.
     """
-    current_position = (row, 1)
-    while current_position is not None:
-        block_at_current_position = get_block_at(board, current_position)
-        if block_at_current_position is None:
-            return False
-        current_position = \
-            Position.right(get_dimension(board), current_position,
-                           Block.get_length(block_at_current_position))
-    return True
+    nb_columns = Dimension.get_nb_of_columns(get_dimension(board))
+    return get_occupancy_of_row(board, row) == (1 << nb_columns) - 1
 
 
 def get_all_full_rows(board):
@@ -262,12 +533,13 @@ def get_all_full_rows(board):
         ASSUMPTIONS
         - The given board is a proper board.
     """
+    dimension = get_dimension(board)
+    full_row_mask = (1 << Dimension.get_nb_of_columns(dimension)) - 1
+    row_masks = get_row_masks(board)
     result = set()
-    current_position = ("a", 1)
-    while current_position is not None:
-        if is_full_row(board, Position.get_row(current_position)):
-            set.add(result, Position.get_row(current_position))
-        current_position = Position.up(get_dimension(board), current_position)
+    for row_index in range(0, Dimension.get_nb_of_rows(dimension)):
+        if row_masks[row_index] == full_row_mask:
+            set.add(result, Position.id_of_row(dimension, row_index + 1))
     return frozenset(result)
 
 
@@ -281,11 +553,28 @@ def get_all_blocks(board):
         - The given board is a proper board.
     """
     result = []
-    current_position = ("a", 1)
-    while current_position is not None:
-        blocks_in_current_row = get_all_blocks_in_row(board, Position.get_row(current_position))
-        list.extend(result, blocks_in_current_row)
-        current_position = Position.up(get_dimension(board), current_position)
+    for row_blocks in get_row_registrations(board):
+        list.extend(result, [block for (_, block) in row_blocks])
+    return result
+
+
+def get_all_placements(board):
+    """
+        Return a list of tuples consisting of the leftmost position of a block on the
+        given board followed by that block, for all the blocks on the given board.
+        - The tuples are ordered according to the position of their block on the board.
+        - A board in the same state as the given board can be rebuilt by adding each
+          of the blocks at its position on a new board. This is used to hand boards
+          to other processes, in which the identity of blocks is not preserved.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    dimension = get_dimension(board)
+    result = []
+    row_registrations = get_row_registrations(board)
+    for row_index in range(0, len(row_registrations)):
+        list.extend(result, [(Position.position_at(dimension, row_index + 1, column), block)
+                             for (column, block) in row_registrations[row_index]])
     return result
 
 
@@ -301,10 +590,7 @@ def contains_block(board, block):
         - The given board is a proper board.
         - The given block is a proper block.
     """
-    for stored_block in get_all_blocks(board):
-        if stored_block is block:
-            return True
-    return False
+    return block in get_leftmost_positions(board)
 
 
 def can_accept_block_at(board, block, position):
@@ -348,10 +634,26 @@ def add_block_at(board, block, position):
         - The given position is a proper position.
         - The given board can accept the given block at the given position.
     """
-    dimension, cells = board
+    cells, positions, row_masks, rows = \
+        get_cells(board), get_leftmost_positions(board), get_row_masks(board), get_row_registrations(board)
+    index = Position.cell_index(get_dimension(board), position)
     for nb_cells in range(0, Block.get_length(block)):
-        cells[position] = block
-        position = Position.right(dimension, position)
+        cells[index + nb_cells] = block
+    positions[block] = position
+    row_index = Position.nb_of_row(get_dimension(board), Position.get_row(position)) - 1
+    row_masks[row_index] |= ((1 << Block.get_length(block)) - 1) << (Position.get_column(position) - 1)
+    bisect.insort(rows[row_index], (Position.get_column(position), block))
+    update_state_hash(board, get_zobrist_key_of(get_dimension(board), block, position))
+    set.add(get_changed_rows(board), Position.get_row(position))
+    support = get_support_graph(board)
+    blocks_above, blocks_below = get_blocks_adjacent_in_cells(get_dimension(board), cells, block, index)
+    support[block] = (blocks_above, blocks_below)
+    for block_above in blocks_above:
+        set.add(support[block_above][1], block)
+    for block_below in blocks_below:
+        set.add(support[block_below][0], block)
+    if len(get_checkpoints(board)) > 0:
+        list.append(get_undo_log(board), (True, block, position))
 
 
 def remove_block_from(board, block):
@@ -365,10 +667,96 @@ def remove_block_from(board, block):
         - The given block is a proper block.
     """
     if contains_block(board, block):
-        _, blocks = board
-        positions_of_block = get_all_positions_of(board, block)
-        for position in positions_of_block:
-            del blocks[position]
+        cells, positions, row_masks, rows = \
+            get_cells(board), get_leftmost_positions(board), get_row_masks(board), get_row_registrations(board)
+        position = dict.pop(positions, block)
+        index = Position.cell_index(get_dimension(board), position)
+        for nb_cells in range(0, Block.get_length(block)):
+            cells[index + nb_cells] = None
+        row_index = Position.nb_of_row(get_dimension(board), Position.get_row(position)) - 1
+        row_masks[row_index] &= ~(((1 << Block.get_length(block)) - 1) << (Position.get_column(position) - 1))
+        row_blocks = rows[row_index]
+        del row_blocks[bisect.bisect_left(row_blocks, (Position.get_column(position),))]
+        update_state_hash(board, get_zobrist_key_of(get_dimension(board), block, position))
+        set.add(get_changed_rows(board), Position.get_row(position))
+        support = get_support_graph(board)
+        blocks_above, blocks_below = dict.pop(support, block)
+        for block_above in blocks_above:
+            set.discard(support[block_above][1], block)
+        for block_below in blocks_below:
+            set.discard(support[block_below][0], block)
+        if len(get_checkpoints(board)) > 0:
+            list.append(get_undo_log(board), (False, block, position))
+
+
+def set_checkpoint(board):
+    """
+        Set a new checkpoint on the given board.
+        - From now on, all additions and removals of blocks on the given board are
+          registered in the undo log of the board, such that they can be undone
+          by rolling back to the checkpoint.
+        - Checkpoints are nested: each checkpoint that is set must eventually be
+          released, and rolling back always concerns the most recent checkpoint
+          that has not been released yet.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    list.append(get_checkpoints(board), len(get_undo_log(board)))
+
+
+def rollback_to_checkpoint(board):
+    """
+        Undo all additions and removals of blocks on the given board since its
+        most recent checkpoint.
+        - The checkpoint itself is not released. The function can therefore be
+          used repeatedly to explore different changes starting from the same
+          state of the board.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - At least one checkpoint is set on the given board.
+    """
+    undo_log, checkpoint = get_undo_log(board), get_checkpoints(board)[-1]
+    changes_to_undo = undo_log[checkpoint:]
+    del undo_log[checkpoint:]
+    if Instrumentation.enabled:
+        Instrumentation.record("Board.rollback_to_checkpoint", "undone_changes", len(changes_to_undo))
+    for (added, block, position) in reversed(changes_to_undo):
+        if added:
+            remove_block_from(board, block)
+        else:
+            add_block_at(board, block, position)
+    # Undoing changes is itself not to be registered.
+    del undo_log[checkpoint:]
+
+
+def get_changes_since_checkpoint(board):
+    """
+        Return a list of all additions and removals of blocks on the given board
+        since its most recent checkpoint, in the order in which they took place.
+        - Each change is a tuple consisting of a boolean that is True for additions
+          and False for removals, followed by the block involved, followed by the
+          leftmost position of that block at the time of the change.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - At least one checkpoint is set on the given board.
+    """
+    return get_undo_log(board)[get_checkpoints(board)[-1]:]
+
+
+def release_checkpoint(board):
+    """
+        Release the most recent checkpoint on the given board without undoing
+        any changes.
+        - Changes since that checkpoint can still be undone by rolling back to
+          an enclosing checkpoint. If no checkpoints are left, the undo log of
+          the given board is cleared.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - At least one checkpoint is set on the given board.
+    """
+    list.pop(get_checkpoints(board))
+    if len(get_checkpoints(board)) == 0:
+        list.clear(get_undo_log(board))
 
 
 def is_airborne(board, block):
@@ -382,12 +770,9 @@ def is_airborne(board, block):
         - The given block is a proper block.
         - The given block is loaded on the given board.
     """
-    occupied_positions = get_all_positions_of(board, block)
-    for position in occupied_positions:
-        position_down = Position.down(get_dimension(board), position)
-        if (position_down is None) or (not is_free_at(board, position_down)):
-            return False
-    return True
+    if Position.get_row(get_leftmost_position_of(board, block)) == "a":
+        return False
+    return len(get_support_graph(board)[block][1]) == 0
 
 
 def get_adjacent_blocks_above(board, block):
@@ -508,26 +893,22 @@ def get_supporting_blocks(board, block):
         NOTE
         - This function must be worked out in an ITERATIVE way.
     """
+    # The blocks directly below each block are registered on the board.
+    support = get_support_graph(board)
     blocks_to_handle = [block]
-    handled_block_ids = []
-    supporting_block_positions = frozenset()
+    handled_blocks = {block}
+    supporting_block_positions = set()
     while len(blocks_to_handle) > 0:
         current_block = list.pop(blocks_to_handle, len(blocks_to_handle) - 1)
-        list.append(handled_block_ids, id(current_block))
-        if current_block is not block:
-            supporting_block_positions |= \
-                frozenset([get_leftmost_position_of(board, current_block)])
-        if Position.get_row(get_leftmost_position_of(board, current_block)) != "a":
-            block_positions = get_all_positions_of(board, current_block)
-            for position in block_positions:
-                block_below = get_block_at(board, Position.down(get_dimension(board), position))
-                if (block_below is not None) and (id(block_below) not in handled_block_ids) and \
-                        (block_below not in blocks_to_handle):
-                    list.append(blocks_to_handle, block_below)
-    return supporting_block_positions
-
-
-def get_supported_blocks(board, block, handled_block_ids=None):
+        for block_below in support[current_block][1]:
+            if block_below not in handled_blocks:
+                set.add(handled_blocks, block_below)
+                list.append(blocks_to_handle, block_below)
+                set.add(supporting_block_positions, get_leftmost_position_of(board, block_below))
+    return frozenset(supporting_block_positions)
+
+
+def get_supported_blocks(board, block, handled_blocks=None):
     """
         Return a mutable set of all the positions of the blocks on the given board
         directly or indirectly supported by the given block on the given board.
@@ -543,20 +924,19 @@ def get_supported_blocks(board, block, handled_block_ids=None):
         - The given block is loaded on the given board.
         NOTE
         - This function must be worked out in a RECURSIVE way.
-        - Leave out the parameter "handled_block_ids" in the skeleton distributed to the
+        - Leave out the parameter "handled_blocks" in the skeleton distributed to the
           students.
     """
-    if handled_block_ids is None:
-        handled_block_ids = []
-    list.append(handled_block_ids, id(block))
+    if handled_blocks is None:
+        handled_blocks = set()
+    set.add(handled_blocks, block)
     supported_block_positions = set()
-    if Position.get_row(get_leftmost_position_of(board, block)) != "X":
-        blocks_directly_above = get_adjacent_blocks_above(board, block)
-        for block_above in blocks_directly_above:
-            if id(block_above) not in handled_block_ids:
-                set.add(supported_block_positions, get_leftmost_position_of(board, block_above))
-                extra_blocks = get_supported_blocks(board, block_above, handled_block_ids)
-                set.update(supported_block_positions, extra_blocks)
+    # The blocks directly above each block are registered on the board.
+    for block_above in get_support_graph(board)[block][0]:
+        if block_above not in handled_blocks:
+            set.add(supported_block_positions, get_leftmost_position_of(board, block_above))
+            extra_blocks = get_supported_blocks(board, block_above, handled_blocks)
+            set.update(supported_block_positions, extra_blocks)
     return supported_block_positions
 
 
@@ -581,22 +961,42 @@ def let_fall(board, block):
         add_block_at(board, block, new_position_for_block)
 
 
-def let_all_blocks_fall(board):
+def let_all_blocks_fall(board, from_row="a"):
     """
         Let all the blocks in the given board fall down until none of them is still
         airborne.
+        - Only blocks in the given row and in rows above the given row are examined.
         ASSUMPTIONS
         - The given board is a proper board.
-    """
-    if Dimension.get_nb_of_rows(get_dimension(board)) > 2:
-        current_position = ("b", 1)
-    else:
-        current_position = ("X",1)
-    while current_position is not None:
-        blocks_in_row = get_all_blocks_in_row(board, Position.get_row(current_position))
-        for block in blocks_in_row:
-            let_fall(board, block)
-        current_position = Position.up(get_dimension(board), current_position)
+        - The given row is within the range of the given board.
+        - None of the blocks below the given row is airborne.
+    """
+    dimension = get_dimension(board)
+    nb_columns = Dimension.get_nb_of_columns(dimension)
+    from_row_nb = Position.nb_of_row(dimension, from_row)
+    # Blocks are handled row by row from the bottom up, such that all the blocks
+    # below the row being handled have already reached their final position.
+    # For each column, the number of the highest occupied row below the row being
+    # handled is registered (0 if no cell in that column is occupied).
+    row_masks, row_registrations = get_row_masks(board), get_row_registrations(board)
+    highest_occupied_rows = [0] * nb_columns
+    columns_to_find = (1 << nb_columns) - 1
+    for row_nb in range(from_row_nb - 1, 0, -1):
+        columns_found = row_masks[row_nb - 1] & columns_to_find
+        for column_index in range(0, nb_columns):
+            if columns_found & (1 << column_index) != 0:
+                highest_occupied_rows[column_index] = row_nb
+        columns_to_find &= ~columns_found
+        if columns_to_find == 0:
+            break
+    for row_nb in range(from_row_nb, Dimension.get_nb_of_rows(dimension) + 1):
+        for (column, block) in row_registrations[row_nb - 1][:]:
+            length = Block.get_length(block)
+            new_row_nb = max(highest_occupied_rows[column - 1:column - 1 + length]) + 1
+            if new_row_nb < row_nb:
+                remove_block_from(board, block)
+                add_block_at(board, block, Position.position_at(dimension, new_row_nb, column))
+            highest_occupied_rows[column - 1:column - 1 + length] = [new_row_nb] * length
 
 
 def let_explode(board, block):
@@ -619,28 +1019,65 @@ def let_explode(board, block):
         - The given block is a proper block.
         - The given block is loaded on the given board.
     """
-    if Block.get_type(block) == Block.ORDINARY:
-        remove_block_from(board, block)
-        return Block.get_length(block)
-    if Block.get_type(block) == Block.FRAGILE:
-        position_of_block = get_leftmost_position_of(board, block)
-        remove_block_from(board, block)
-        replacing_blocks = Block.split_block(block)
-        for replacing_block in replacing_blocks:
-            add_block_at(board, replacing_block, position_of_block)
-            position_of_block = \
-                Position.right(get_dimension(board), position_of_block,
-                               Block.get_length(replacing_block))
-        return 2 * Block.get_length(block)
-    elif Block.get_type(block) == Block.ELECTRIFIED:
-        adjacent_blocks = \
-            get_adjacent_blocks_below(board, block) + get_adjacent_blocks_above(board, block)
-        remove_block_from(board, block)
-        total_score = Block.get_length(block)
-        for block in adjacent_blocks:
-            if contains_block(board, block):
-                total_score += let_explode(board, block)
-        return total_score
+    return let_all_explode(board, [block])
+
+
+def let_all_explode(board, blocks):
+    """
+        Let the given blocks on the given board explode one after the other, and
+        return the score resulting from all explosions.
+        - Each of the given blocks explodes as described for let_explode, unless it
+          has already exploded as a result of earlier explosions.
+        - Chain reactions of electrified blocks are worked out without recursion.
+          Blocks explode in the same order as they would if let_explode were applied
+          recursively: the blocks adjacent to an electrified block explode in
+          ascending order of their position, first those below and then those
+          above it, and each of them completes its own chain reaction before the
+          next one explodes.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - Each of the given blocks is a proper block loaded on the given board.
+    """
+    positions, support = get_leftmost_positions(board), get_support_graph(board)
+    exploded_blocks = set()
+    total_score = 0
+    # Each element of the worklist is a list of blocks still to explode, followed
+    # by the index of the next block in that list.
+    worklist = [[blocks, 0]]
+    while len(worklist) > 0:
+        work = worklist[-1]
+        blocks_to_explode, index = work
+        if index == len(blocks_to_explode):
+            list.pop(worklist)
+            continue
+        work[1] = index + 1
+        block = blocks_to_explode[index]
+        if block in exploded_blocks:
+            continue
+        set.add(exploded_blocks, block)
+        if Block.get_type(block) == Block.ORDINARY:
+            remove_block_from(board, block)
+            total_score += Block.get_length(block)
+        elif Block.get_type(block) == Block.FRAGILE:
+            position_of_block = positions[block]
+            remove_block_from(board, block)
+            replacing_blocks = Block.split_block(block)
+            for replacing_block in replacing_blocks:
+                add_block_at(board, replacing_block, position_of_block)
+                position_of_block = \
+                    Position.right(get_dimension(board), position_of_block,
+                                   Block.get_length(replacing_block))
+            total_score += 2 * Block.get_length(block)
+        elif Block.get_type(block) == Block.ELECTRIFIED:
+            # Blocks directly below or above a block all occupy the same row.
+            blocks_above, blocks_below = support[block]
+            adjacent_blocks = \
+                sorted(blocks_below, key=lambda adjacent_block: Position.get_column(positions[adjacent_block])) + \
+                sorted(blocks_above, key=lambda adjacent_block: Position.get_column(positions[adjacent_block]))
+            remove_block_from(board, block)
+            total_score += Block.get_length(block)
+            list.append(worklist, [adjacent_blocks, 0])
+    return total_score
 
 
 def is_stable(board):
@@ -744,17 +1181,48 @@ def can_move_over(board, block, nb_steps):
     """
     if not isinstance(nb_steps, int):
         return False
-    current_position = get_leftmost_position_of(board, block)
-    if (nb_steps > 0) and (Block.get_length(block) > 1):
-        current_position = Position.right(get_dimension(board), current_position, Block.get_length(block) - 1)
-    while nb_steps != 0:
-        if nb_steps < 0:
-            current_position = Position.left(get_dimension(board), current_position)
-            nb_steps += 1
-        else:
-            current_position = Position.right(get_dimension(board), current_position)
-            nb_steps -= 1
-        if (current_position is None) or (not is_free_at(board, current_position)):
+    if nb_steps == 0:
+        return True
+    leftmost_position = get_leftmost_position_of(board, block)
+    if nb_steps < 0:
+        first_column = Position.get_column(leftmost_position) + nb_steps
+    else:
+        first_column = Position.get_column(leftmost_position) + Block.get_length(block)
+    last_column = first_column + abs(nb_steps) - 1
+    if (first_column < 1) or (last_column > Dimension.get_nb_of_columns(get_dimension(board))):
+        return False
+    cells_to_cross = ((1 << abs(nb_steps)) - 1) << (first_column - 1)
+    return get_occupancy_of_row(board, Position.get_row(leftmost_position)) & cells_to_cross == 0
+
+
+def is_stable_after_move(board, block, nb_steps):
+    """
+        Check whether the given board is still stable after moving the given block
+        over the given number of steps, without any row being completely filled.
+        - True if and only if the given block is not airborne at its new position,
+          and none of the blocks directly above the given block is airborne after
+          the move. Moving a block horizontally does not change the number of
+          occupied cells in its row, so no row becomes completely filled.
+        - The given board is not changed.
+        ASSUMPTIONS
+        - The given board is a proper and stable board, of which no row is
+          completely filled.
+        - The given block is a proper block loaded on the given board.
+        - The given block can move over the given number of steps.
+    """
+    dimension = get_dimension(board)
+    position = get_leftmost_position_of(board, block)
+    row_nb = Position.nb_of_row(dimension, Position.get_row(position))
+    old_cells = ((1 << Block.get_length(block)) - 1) << (Position.get_column(position) - 1)
+    new_cells = old_cells << nb_steps if nb_steps >= 0 else old_cells >> -nb_steps
+    row_masks = get_row_masks(board)
+    if (row_nb > 1) and (row_masks[row_nb - 2] & new_cells == 0):
+        return False
+    cells_in_row = (row_masks[row_nb - 1] & ~old_cells) | new_cells
+    for block_above in get_support_graph(board)[block][0]:
+        cells_below_block_above = ((1 << Block.get_length(block_above)) - 1) << \
+                                  (Position.get_column(get_leftmost_position_of(board, block_above)) - 1)
+        if cells_in_row & cells_below_block_above == 0:
             return False
     return True
 
@@ -785,41 +1253,8 @@ def print_board(board):
         INTERNAL NOTE
         - The body of this function must be included in the skeleton.
     """
-    current_position = ("X", 1)
-    while current_position is not None:
-        for lines in range(0, 2):
-            if lines == 1:
-                print("\033[1;31;48m" + '{:2}'.format(Position.get_row(current_position)), end="  ")
-            else:
-                print("\033[1;30;48m" + "  ", end="  ")
-            column_position = current_position
-            left_position = None
-            while column_position is not None:
-                current_block = get_block_at(board, column_position)
-                right_position = Position.right(get_dimension(board), column_position)
-                if current_block is None:
-                    print("\033[1;30;48m" + ("|   " if lines == 1 else "----"), end="")
-                else:
-                    block_symbol = Block.get_symbol(current_block)
-                    if (left_position is None) or \
-                            (get_block_at(board, left_position) is not current_block):
-                        # Leftmost cell of a block.
-                        if lines == 1:
-                            print("\033[1;" + str(Block.get_color(current_block)) + ";48m|" + block_symbol * 3, end="")
-                        else:
-                            print("\033[1;30;48m----", end="")
-                    else:
-                        if lines == 1:
-                            print("\033[1;" + str(Block.get_color(current_block)) + ";48m" + block_symbol * 4, end="")
-                        else:
-                            print("\033[1;30;48m----", end="")
-                left_position = column_position
-                column_position = right_position
-            print("\033[1;30;48m" + ("|" if lines == 1 else "-"))
-        current_position = Position.down(get_dimension(board), current_position)
-    print("   ", "\033[1;30;48m" + ("-" * (Dimension.get_nb_of_columns(get_dimension(board)) * 4 + 1)))
-    print("    ", end="")
-    for column in range(1, Dimension.get_nb_of_columns(get_dimension(board)) + 1):
-        print("\033[1;30;48m" + '{:3d}'.format(column), end=" ")
-    print()
+    import sys
+    import Renderer
+    # The whole board is written at once.
+    sys.stdout.write(Renderer.render_board(board))
 
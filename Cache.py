@@ -0,0 +1,143 @@
+# Caches are used to remember results of expensive computations. They hold
+# a bounded number of entries; when a cache is full, an entry is evicted
+# according to the eviction policy of the cache.
+import collections
+
+# Eviction policies for caches.
+
+LEAST_RECENTLY_USED = 1
+FIRST_IN_FIRST_OUT  = 2
+
+
+def is_proper_cache(cache):
+    """
+        Check whether the given cache is a proper cache.
+        - True if and only if the given cache is a tuple consisting of a positive
+          integer capacity, a proper eviction policy, an ordered dictionary that does
+          not hold more entries than that capacity and a dictionary of statistics.
+        ASSUMPTIONS
+        - None
+    """
+    if not isinstance(cache, tuple):
+        return False
+    if len(cache) != 4:
+        return False
+    capacity, policy, entries, statistics = cache
+    if (not isinstance(capacity, int)) or (capacity <= 0):
+        return False
+    if policy not in {LEAST_RECENTLY_USED, FIRST_IN_FIRST_OUT}:
+        return False
+    if not isinstance(entries, collections.OrderedDict):
+        return False
+    if not isinstance(statistics, dict):
+        return False
+    return len(entries) <= capacity
+
+
+def make_cache(capacity, policy=LEAST_RECENTLY_USED):
+    """
+        Return a new empty cache that can hold at most the given number of entries,
+        and that evicts entries according to the given policy.
+        - If the policy is LEAST_RECENTLY_USED, the entry that has been stored or
+          looked up least recently is evicted from a full cache. If the policy is
+          FIRST_IN_FIRST_OUT, the entry that has been stored first is evicted.
+        ASSUMPTIONS
+        - The given capacity is a positive integer number.
+        - The given policy is either LEAST_RECENTLY_USED or FIRST_IN_FIRST_OUT.
+    """
+    return (capacity, policy, collections.OrderedDict(), {"hits": 0, "misses": 0, "evictions": 0})
+
+
+def get_capacity(cache):
+    """
+        Return the maximum number of entries the given cache can hold.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+    """
+    return cache[0]
+
+
+def get_policy(cache):
+    """
+        Return the eviction policy of the given cache.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+    """
+    return cache[1]
+
+
+def get_nb_of_entries(cache):
+    """
+        Return the number of entries currently stored in the given cache.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+    """
+    return len(cache[2])
+
+
+def get_statistics(cache):
+    """
+        Return a dictionary with the number of hits, the number of misses and the
+        number of evictions of the given cache so far.
+        - The resulting dictionary maps the keys "hits", "misses" and "evictions"
+          to integer numbers. Changing it has no effect on the given cache.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+    """
+    return dict.copy(cache[3])
+
+
+def lookup(cache, key):
+    """
+        Return the value stored in the given cache for the given key.
+        - None is returned if the given cache has no entry for the given key.
+        - With a LEAST_RECENTLY_USED policy, the entry for the given key becomes
+          the most recently used entry.
+        - The lookup is counted as a hit or as a miss in the statistics of the
+          given cache.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+        - The given key is hashable.
+    """
+    _, policy, entries, statistics = cache
+    value = collections.OrderedDict.get(entries, key, None)
+    if value is None:
+        statistics["misses"] += 1
+    else:
+        statistics["hits"] += 1
+        if policy == LEAST_RECENTLY_USED:
+            collections.OrderedDict.move_to_end(entries, key)
+    return value
+
+
+def store(cache, key, value):
+    """
+        Store the given value for the given key in the given cache.
+        - Any value already stored for the given key is replaced.
+        - With a LEAST_RECENTLY_USED policy, the entry for the given key becomes
+          the most recently used entry. If the cache is full, an entry is evicted
+          according to the policy of the given cache.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+        - The given key is hashable.
+        - The given value is not None.
+    """
+    capacity, policy, entries, statistics = cache
+    entries[key] = value
+    if policy == LEAST_RECENTLY_USED:
+        collections.OrderedDict.move_to_end(entries, key)
+    if len(entries) > capacity:
+        collections.OrderedDict.popitem(entries, last=False)
+        statistics["evictions"] += 1
+
+
+def clear(cache):
+    """
+        Remove all entries from the given cache, and reset its statistics.
+        ASSUMPTIONS
+        - The given cache is a proper cache.
+    """
+    _, _, entries, statistics = cache
+    collections.OrderedDict.clear(entries)
+    for name in statistics:
+        statistics[name] = 0
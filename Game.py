@@ -3,9 +3,12 @@ import Dimension
 import Position
 import Block
 import Board
+import Cache
+import Instrumentation
+import Recording
 
 
-def let_all_full_rows_explode(board):
+def let_all_full_rows_explode(board, full_rows=None):
     """
         Let all the blocks in all the full rows on the given board explode.
         - The function starts with examining the given board collecting all the
@@ -20,22 +23,24 @@ def let_all_full_rows_explode(board):
           on their own. They may, however, explode as a result of other electrified
           blocks exploding.
         - The function returns the score resulting from all explosions.
+        - If the rows that are completely filled are already known, they can be
+          passed as the letters of those rows, such that the board is not examined.
         ASSUMPTIONS
         - The given board is a proper board.
+        - If some full rows are given, they are exactly the rows on the given board
+          that are completely filled.
         NOTE
         - This function is given to the students, such that the backtracking
           algorithm will not behave different because of differences in this algorithm.
     """
+    if full_rows is None:
+        full_rows = Board.get_all_full_rows(board)
     blocks_to_explode = []
-    full_rows_sorted = list(Board.get_all_full_rows(board))
+    full_rows_sorted = list(full_rows)
     list.sort(full_rows_sorted)
     for row in full_rows_sorted:
         list.extend(blocks_to_explode, Board.get_all_blocks_in_row(board, row))
-    total_score = 0
-    for block in blocks_to_explode:
-        if Board.contains_block(board, block):
-            total_score += Board.let_explode(board, block)
-    return total_score
+    return Board.let_all_explode(board, blocks_to_explode)
 
 
 def adjust_score(score, level, score_from_explosions, nb_full_rows, nb_columns):
@@ -61,7 +66,7 @@ def adjust_score(score, level, score_from_explosions, nb_full_rows, nb_columns):
     return (score, level)
 
 
-def stabilize_board(level, score, board):
+def stabilize_board(level, score, board, cache=None):
     """
         Stabilize the given board and return the updated level and score in view of
         the given level and given score.
@@ -69,27 +74,166 @@ def stabilize_board(level, score, board):
           followed by explosions of all full rows, until the board is stable.
         - The function returns a tuple (l,s) in which l is the new level and s is
           the new score in view of the given level and given score.
+        - If a cache is given, the outcome of stabilizing boards is remembered in
+          that cache for the state of the board, the given level and the given score.
+          If the cache already knows the outcome, the given board is changed into
+          the resulting stable board without letting blocks fall or explode.
         ASSUMPTIONS
         - The given level is a positive integer number.
         - The given score is a non-negative integer number.
         - The given board is a proper board.
+        - The given cache is either None or a proper cache that is only used to
+          stabilize boards.
         NOTE
         - This function is given to the students, such that the backtracking
           algorithm will not behave different because of differences in this algorithm.
     """
-    Board.let_all_blocks_fall(board)
-    nb_full_rows = len(Board.get_all_full_rows(board))
-    while (nb_full_rows > 0):
-        if nb_full_rows > 0:
-            score_from_explosions = let_all_full_rows_explode(board)
-            score, level = \
-                adjust_score(score, level, score_from_explosions, nb_full_rows,
-                             Dimension.get_nb_of_columns(Board.get_dimension(board)))
-        Board.let_all_blocks_fall(board)
-        nb_full_rows = len(Board.get_all_full_rows(board))
+    if cache is not None:
+        key = (Board.get_state_hash(board), level, score)
+        known_outcome = Cache.lookup(cache, key)
+        if known_outcome is not None:
+            new_level, new_score, changes = known_outcome
+            apply_stabilization_changes(board, changes)
+            Board.take_changed_rows(board)
+            return (new_level, new_score)
+        Board.set_checkpoint(board)
+    try:
+        # Only rows that changed since the board was last stabilized are examined.
+        full_rows = let_changed_rows_settle(board)
+        nb_full_rows = len(full_rows)
+        while (nb_full_rows > 0):
+            if Instrumentation.enabled:
+                Instrumentation.record("Game.stabilize_board", "iterations")
+            if nb_full_rows > 0:
+                score_from_explosions = let_all_full_rows_explode(board, full_rows)
+                score, level = \
+                    adjust_score(score, level, score_from_explosions, nb_full_rows,
+                                 Dimension.get_nb_of_columns(Board.get_dimension(board)))
+            full_rows = let_changed_rows_settle(board)
+            nb_full_rows = len(full_rows)
+        if cache is not None:
+            changes = get_stabilization_changes(Board.get_changes_since_checkpoint(board))
+            Cache.store(cache, key, (level, score, changes))
+    finally:
+        # The changes remain registered for enclosing checkpoints, also if
+        # stabilizing is interrupted.
+        if cache is not None:
+            Board.release_checkpoint(board)
     return (level, score)
 
 
+def let_changed_rows_settle(board):
+    """
+        Let all the blocks on the given board fall down, starting from the lowest row
+        that changed since the previous call of Board.take_changed_rows, and return
+        a frozen set of the letters of all the rows that are completely filled
+        after that.
+        - Only rows that changed are examined for being completely filled.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - All rows that did not change since the previous call of
+          Board.take_changed_rows are stable and not completely filled.
+    """
+    dimension = Board.get_dimension(board)
+    changed_rows = Board.take_changed_rows(board)
+    if len(changed_rows) == 0:
+        return frozenset()
+    lowest_changed_row_nb = min([Position.nb_of_row(dimension, row) for row in changed_rows])
+    Board.let_all_blocks_fall(board, Position.id_of_row(dimension, lowest_changed_row_nb))
+    changed_rows |= Board.take_changed_rows(board)
+    return frozenset([row for row in changed_rows if Board.is_full_row(board, row)])
+
+
+def get_stabilization_changes(changes_on_board):
+    """
+        Return a summary of the given changes on a board that took place while
+        stabilizing that board.
+        - The given changes are registered as described for
+          Board.get_changes_since_checkpoint.
+        - The function returns a tuple consisting of a tuple of moved blocks followed
+          by a tuple of new blocks. Each moved block is described by a tuple of its
+          leftmost position before stabilizing and its leftmost position after
+          stabilizing (None if it exploded). Each new block is described by a tuple
+          of its length, its type, its color and its leftmost position after
+          stabilizing.
+        - The summary does not refer to any block, such that it can be applied to
+          any board in the same state as the board that was stabilized.
+        ASSUMPTIONS
+        - The given changes are all the changes that took place while stabilizing
+          some board.
+    """
+    original_positions = {}
+    final_positions = {}
+    involved_blocks = []
+    for (added, block, position) in changes_on_board:
+        if block not in final_positions:
+            list.append(involved_blocks, block)
+            # Blocks that were added first did not exist before stabilizing.
+            original_positions[block] = None if added else position
+        final_positions[block] = position if added else None
+    moved_blocks = []
+    new_blocks = []
+    for block in involved_blocks:
+        original_position = original_positions[block]
+        final_position = final_positions[block]
+        if original_position is None:
+            if final_position is not None:
+                list.append(new_blocks, (Block.get_length(block), Block.get_type(block),
+                                         Block.get_color(block), final_position))
+        elif original_position != final_position:
+            list.append(moved_blocks, (original_position, final_position))
+    return (tuple(moved_blocks), tuple(new_blocks))
+
+
+def apply_stabilization_changes(board, changes):
+    """
+        Apply the given summary of the changes resulting from stabilizing a board
+        to the given board.
+        - The summary is structured as described for get_stabilization_changes.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - The given summary results from stabilizing a board in the same state as the
+          given board.
+    """
+    moved_blocks, new_blocks = changes
+    blocks_to_move = []
+    for (original_position, final_position) in moved_blocks:
+        list.append(blocks_to_move, (Board.get_block_at(board, original_position), final_position))
+    for (block, _) in blocks_to_move:
+        Board.remove_block_from(board, block)
+    for (block, final_position) in blocks_to_move:
+        if final_position is not None:
+            Board.add_block_at(board, block, final_position)
+    for (length, type, color, final_position) in new_blocks:
+        Board.add_block_at(board, Block.make_block(length, type, color), final_position)
+
+
+def move_and_stabilize(level, score, board, block, nb_steps, stabilize_cache=None):
+    """
+        Move the given block on the given board over the given number of steps,
+        stabilize the board and return the updated level and score in view of the
+        given level and the given score (see stabilize_board).
+        - If the board is still stable after the move (see Board.is_stable_after_move),
+          nothing falls or explodes. The board is not stabilized in that case, and
+          the given level and the given score are returned.
+        - The given stabilize cache is passed to stabilize_board.
+        ASSUMPTIONS
+        - The given level is a positive integer number.
+        - The given score is a non-negative integer number.
+        - The given board is a proper and stable board, of which no row is
+          completely filled.
+        - The given block is loaded on the given board, and can move over the given
+          number of steps.
+        - The given stabilize cache is either None or a proper cache that is only
+          used to stabilize boards.
+    """
+    if Board.is_stable_after_move(board, block, nb_steps):
+        Board.move_block_horizontally(board, block, nb_steps)
+        return (level, score)
+    Board.move_block_horizontally(board, block, nb_steps)
+    return stabilize_board(level, score, board, stabilize_cache)
+
+
 def get_all_possible_steps(board, block):
     """
        Return a sequence of all possible steps over which the given block can be
@@ -113,7 +257,7 @@ def get_all_possible_steps(board, block):
     return result
 
 
-def get_move_with_highest_score(board, level, score):
+def get_move_with_highest_score(board, level, score, stabilize_cache=None, vectorized=False, nb_workers=None):
     """
         Return the move on the given board that will yield the highest possible score
         in view of the given level and the given score.
@@ -123,31 +267,202 @@ def get_move_with_highest_score(board, level, score):
           to the left border.
         - The function returns a tuple consisting of the block to be moved followed
           by the number of steps to move over. None is returned if no move is possible.
+        - The given stabilize cache is passed to stabilize_board.
+        - If vectorized is True, all possible moves are scored at once by the
+          batch engine (see BatchEngine.get_scores_of_moves), which requires NumPy.
+          No stabilize cache is used in that case. If there are fewer possible moves
+          than BatchEngine.MIN_NB_OF_MOVES_FOR_BATCH, the moves are scored one by one
+          instead, because the batch engine is slower for so few moves.
+        - If a number of workers greater than 1 is given, the possible moves are
+          scored in parallel by a pool of that many processes (see
+          get_process_pool). No stabilize cache is used in that case.
+        - If the given board is stable and none of its rows is completely filled,
+          moves after which the board is still stable (see Board.is_stable_after_move)
+          keep the given score, without stabilizing the board.
+        - Moves are tried on the given board itself and undone afterwards. Upon
+          exit, also if an exception is raised, the given board is in the same state
+          it was in upon entry.
         ASSUMPTIONS
         - The given level is a positive integer number.
         - The given score is a non-negative integer number.
         - The given board is a proper board.
+        - The given stabilize cache is either None or a proper cache that is only
+          used to stabilize boards.
+        - The given number of workers is either None or a positive integer number.
         NOTE
         - This function must not be included in the skeleton distributed among the students.
     """
+    if vectorized:
+        import BatchEngine
+        all_moves = [(block, nb_steps) for block in Board.get_all_blocks(board)
+                     for nb_steps in get_all_possible_steps(board, block)]
+        if len(all_moves) == 0:
+            return None
+        if len(all_moves) >= BatchEngine.MIN_NB_OF_MOVES_FOR_BATCH:
+            # The first move with the highest score satisfies the tie-break rules.
+            scores = BatchEngine.get_scores_of_moves(board, level, score, all_moves)
+            return all_moves[int(scores.argmax())]
+    if (nb_workers is not None) and (nb_workers > 1):
+        all_moves = [(block, nb_steps) for block in Board.get_all_blocks(board)
+                     for nb_steps in get_all_possible_steps(board, block)]
+        if len(all_moves) == 0:
+            return None
+        scores = get_scores_of_moves_in_parallel(board, level, score, all_moves, nb_workers)
+        # The first move with the highest score satisfies the tie-break rules.
+        return all_moves[scores.index(max(scores))]
     highest_score_so_far = None
     all_blocks = Board.get_all_blocks(board)
-    for block in all_blocks:
-        for nb_steps in get_all_possible_steps(board, block):
-            copy_board = Board.copy_board(board)
-            Board.move_block_horizontally(copy_board, block, nb_steps)
-            _, new_score = stabilize_board(level, score, copy_board)
-            if (highest_score_so_far is None) or (new_score > highest_score_so_far):
-                highest_score_so_far = new_score
-                best_block_so_far = block
-                steps_to_move_over = nb_steps
+    is_settled = Board.is_stable(board) and (len(Board.get_all_full_rows(board)) == 0)
+    Board.set_checkpoint(board)
+    try:
+        for block in all_blocks:
+            for nb_steps in get_all_possible_steps(board, block):
+                if is_settled and Board.is_stable_after_move(board, block, nb_steps):
+                    # Nothing falls or explodes after the move.
+                    new_score = score
+                else:
+                    Board.move_block_horizontally(board, block, nb_steps)
+                    _, new_score = stabilize_board(level, score, board, stabilize_cache)
+                    Board.rollback_to_checkpoint(board)
+                if (highest_score_so_far is None) or (new_score > highest_score_so_far):
+                    highest_score_so_far = new_score
+                    best_block_so_far = block
+                    steps_to_move_over = nb_steps
+    finally:
+        # Nothing is left to undo, unless a move was interrupted by an exception.
+        Board.rollback_to_checkpoint(board)
+        Board.release_checkpoint(board)
     if highest_score_so_far is None:
         return None
     else:
         return (best_block_so_far, steps_to_move_over)
 
 
-def play_greedy(blocks, dimension=(8, 10)):
+# Pools of worker processes, reused across calls for each number of workers.
+# Each pool is registered together with the value its workers share as the
+# length of the shortest solution found so far in a parallel search (see
+# search_top_moves_in_parallel).
+process_pools = {}
+
+
+def get_process_pool(nb_workers):
+    """
+        Return a pool of the given number of worker processes.
+        - The pool is created the first time it is requested, and reused afterwards,
+          unless it has been discarded (see discard_process_pool).
+        - All pools are shut down when the interpreter exits.
+        ASSUMPTIONS
+        - The given number of workers is a positive integer number.
+    """
+    if nb_workers not in process_pools:
+        import atexit
+        import concurrent.futures
+        import multiprocessing
+        solution_length = multiprocessing.Value("i", 0)
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=nb_workers,
+                                                      initializer=set_shared_solution_length,
+                                                      initargs=(solution_length,))
+        process_pools[nb_workers] = (pool, solution_length)
+        # Registering again would shut down the pools twice.
+        atexit.unregister(shut_down_process_pools)
+        atexit.register(shut_down_process_pools)
+    return process_pools[nb_workers][0]
+
+
+def discard_process_pool(pool):
+    """
+        Shut down the given pool of worker processes, without waiting for the work
+        it is doing, and make get_process_pool create a new pool the next time a pool
+        of its size is requested.
+        - Pools that have broken down (a worker process terminated abruptly) must be
+          discarded, because they reject all further work.
+    """
+    for nb_workers in list(process_pools):
+        if process_pools[nb_workers][0] is pool:
+            del process_pools[nb_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shut_down_process_pools():
+    """
+        Shut down all the pools of worker processes created by get_process_pool.
+    """
+    for (pool, _) in list(process_pools.values()):
+        pool.shutdown(wait=True, cancel_futures=True)
+    dict.clear(process_pools)
+
+
+def get_scores_of_moves_in_parallel(board, level, score, moves, nb_workers):
+    """
+        Return a list with the score resulting from each of the given moves on the
+        given board, in view of the given level and the given score.
+        - The given moves are collected in a list of tuples consisting of a block to
+          move followed by the distance to move it over.
+        - The moves are split in consecutive chunks, that are scored by a pool of the
+          given number of worker processes. The resulting scores are in the same
+          order as the given moves.
+        - If the pool breaks down, it is discarded (see discard_process_pool) and
+          the error is raised again.
+        ASSUMPTIONS
+        - The given board is a proper board.
+        - The given level is a positive integer number.
+        - The given score is a non-negative integer number.
+        - Each block in the given moves is loaded on the given board, and can move
+          over the distance associated with it.
+        - The given number of workers is a positive integer number.
+    """
+    import concurrent.futures.process
+    placements = Board.get_all_placements(board)
+    # Blocks are handed to the workers by their position.
+    portable_moves = [(Board.get_leftmost_position_of(board, block), nb_steps) for (block, nb_steps) in moves]
+    chunk_size = max(1, -(-len(moves) // (4 * nb_workers)))
+    chunks = [portable_moves[start:start + chunk_size] for start in range(0, len(moves), chunk_size)]
+    nb_chunks = len(chunks)
+    pool = get_process_pool(nb_workers)
+    result = []
+    try:
+        for scores in pool.map(score_moves, [Board.get_dimension(board)] * nb_chunks, [placements] * nb_chunks,
+                               [level] * nb_chunks, [score] * nb_chunks, chunks):
+            list.extend(result, scores)
+    except concurrent.futures.process.BrokenProcessPool:
+        discard_process_pool(pool)
+        raise
+    return result
+
+
+def score_moves(dimension, placements, level, score, moves):
+    """
+        Return a list with the score resulting from each of the given moves on a board
+        with the given dimension loaded with the given blocks, in view of the given
+        level and the given score.
+        - The given blocks are collected in a sequence of tuples consisting of the
+          leftmost position of a block followed by the block itself (see
+          Board.get_all_placements).
+        - The given moves are collected in a sequence of tuples consisting of the
+          leftmost position of the block to move followed by the distance to move it over.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given blocks can be added to an empty board in a valid way.
+        - The given level is a positive integer number.
+        - The given score is a non-negative integer number.
+        - Each position in the given moves is the leftmost position of a block that
+          can move over the distance associated with it.
+    """
+    board = Board.make_board(dimension)
+    for (position, block) in placements:
+        Board.add_block_at(board, block, position)
+    result = []
+    Board.set_checkpoint(board)
+    for (position, nb_steps) in moves:
+        Board.move_block_horizontally(board, Board.get_block_at(board, position), nb_steps)
+        _, new_score = stabilize_board(level, score, board)
+        Board.rollback_to_checkpoint(board)
+        list.append(result, new_score)
+    Board.release_checkpoint(board)
+    return result
+
+
+def play_greedy(blocks, dimension=(8, 10), stabilize_cache=None, nb_workers=None, recorder=None):
     """
        Play the game in a greedy way on a board with the given dimension,
        using the given blocks to fill the bottom row in each step of the game.
@@ -163,6 +478,8 @@ def play_greedy(blocks, dimension=(8, 10)):
          followed by a list of all the moves that have been made. Each move in the
          latter list is a tuple containing the block to move, followed by the
          distance over which that block has been moved.
+       - The game comes to an end as soon as the overflow row is no longer empty,
+         or as soon as no block on the board can be moved.
        ASSUMPTIONS
        - The given dimension is a proper dimension.
        - Each element in the list of blocks ((blocks[I]) is a sequence that can be
@@ -174,21 +491,52 @@ def play_greedy(blocks, dimension=(8, 10)):
        - Each basic element in the list of blocks ((blocks[I][J]) is a tuple
          involving a (leftmost) position in the bottom row of the board followed by
          a proper block for a board with the given dimension.
+       - The given stabilize cache is either None or a proper cache that is only
+         used to stabilize boards. It is passed to stabilize_board.
+       - The given number of workers is passed to get_move_with_highest_score.
+       - The given recorder is either None or a proper recorder for the given
+         dimension (see Recording.make_recorder). If a recorder is given, each row
+         of blocks and each move is recorded.
+    """
+    total_score, moves, _ = play_greedy_game(blocks, dimension, stabilize_cache, nb_workers, recorder)
+    return (total_score, moves)
+
+
+def play_greedy_game(blocks, dimension=(8, 10), stabilize_cache=None, nb_workers=None, recorder=None):
+    """
+       Play the game in a greedy way as described for play_greedy, and return a
+       tuple consisting of the total score, followed by the list of all the moves
+       that have been made, followed by the level at the end of the game.
+       ASSUMPTIONS
+       - The given arguments satisfy all the assumptions of play_greedy.
     """
     current_level, total_score = 1, 0
     the_board = Board.make_board(dimension)
     moves = []
     while (len(blocks) > 0) and Board.is_empty_row(the_board, "X"):
         Board.insert_bottom_row(the_board, blocks.pop(0))
-        current_level, total_score = stabilize_board(current_level, total_score, the_board)
-        block, nb_steps = get_move_with_highest_score(the_board, current_level, total_score)
+        if recorder is not None:
+            Recording.record_row(recorder, the_board, Recording.INSERTED_ROW)
+        current_level, total_score = \
+            stabilize_board(current_level, total_score, the_board, stabilize_cache)
+        best_move = \
+            get_move_with_highest_score(the_board, current_level, total_score, stabilize_cache,
+                                        nb_workers=nb_workers)
+        if best_move is None:
+            break
+        block, nb_steps = best_move
+        if recorder is not None:
+            Recording.record_move(recorder, Board.get_leftmost_position_of(the_board, block), nb_steps)
         Board.move_block_horizontally(the_board, block, nb_steps)
         list.append(moves, (block, nb_steps))
-        current_level, total_score = stabilize_board(current_level, total_score, the_board)
-    return (total_score, moves)
+        current_level, total_score = \
+            stabilize_board(current_level, total_score, the_board, stabilize_cache)
+    return (total_score, moves, current_level)
 
 
-def get_top_moves(board, blocks, min_score=100, max_nb_moves=10, level=1, score=0):
+def get_top_moves(board, blocks, min_score=100, max_nb_moves=10, level=1, score=0,
+                  transposition_table_size=100000, stabilize_cache=None, nb_workers=None, split_depth=1,
+                  iterative_deepening=False, branch_and_bound=True, statistics=None):
     """
        Compute the best possible moves to play the game on the given board starting from
        the given level and the given score using the given blocks to fill the bottom row
@@ -211,7 +559,28 @@ def get_top_moves(board, blocks, min_score=100, max_nb_moves=10, level=1, score=
          than all other solutions of the same length using Python's operator to compare
          lists.
        - Upon exit, the given board and the given list of blocks must be in the same
-         state they were in upon entry.
+         state they were in upon entry. This also holds if an exception is raised
+         during the search.
+       - Results of searches from states that are reached along different sequences
+         of moves are remembered in a transposition table holding at most the given
+         number of entries. The least recently used entry is evicted from a full
+         table. No transposition table is used if the given size is zero.
+       - The given stabilize cache is passed to stabilize_board.
+       - If a number of workers greater than 1 is given, the search is split over
+         a pool of that many processes, each of them searching the subtrees after
+         the first moves up to the given split depth (see search_top_moves_in_parallel).
+         The result is the same as the result of the sequential search.
+       - If iterative deepening is requested, the function searches for solutions of
+         at most 0 moves, then for solutions of at most 1 move, and so on, until a
+         solution is found or the given maximum number of moves is reached. This
+         avoids exploring long sequences of moves when a short solution exists.
+         The result is the same as without iterative deepening.
+       - If branch and bound is requested, the search does not explore states from
+         which the minimal score cannot be reached (see get_score_upper_bound).
+       - If a dictionary of statistics is given, the number of states that have been
+         expanded, the number of states that have been pruned and the number of moves
+         that have been skipped because an earlier move has the same outcome are
+         stored in it under the keys "nodes_expanded", "nodes_pruned" and "duplicates".
        ASSUMPTIONS
        - The given board is a proper and stable board.
        - Each element in the list of blocks ((blocks[I]) is a sequence that can be
@@ -228,40 +597,474 @@ def get_top_moves(board, blocks, min_score=100, max_nb_moves=10, level=1, score=
          the function must return None.
        - The given level is a positive integer number.
        - The given score is a non-negative integer number.
+       - The given size of the transposition table is a non-negative integer number.
+       - The given stabilize cache is either None or a proper cache that is only
+         used to stabilize boards.
+       - The given number of workers is either None or a positive integer number.
+       - The given split depth is a positive integer number.
+       - The given statistics are either None or a dictionary.
     """
+    search = make_search_state(transposition_table_size, stabilize_cache, branch_and_bound)
+    # With iterative deepening, the transposition table is shared by all depths.
+    depths = range(0, max_nb_moves + 1) if iterative_deepening else [max_nb_moves]
+    solution = None
+    for depth in depths:
+        if (nb_workers is not None) and (nb_workers > 1):
+            solution = search_top_moves_in_parallel(board, blocks, min_score, depth, level, score, search,
+                                                    transposition_table_size, nb_workers, split_depth)
+        else:
+            solution = search_top_moves(board, blocks, min_score, depth, level, score, search)
+        if solution is not None:
+            break
+    if statistics is not None:
+        dict.update(statistics, search["statistics"])
+    if Instrumentation.enabled:
+        for name in search["statistics"]:
+            Instrumentation.record("Game.get_top_moves", name, search["statistics"][name])
+    return solution
+
+
+def make_search_state(transposition_table_size, stabilize_cache, branch_and_bound):
+    """
+       Return a new search state for search_top_moves, with a transposition table
+       holding at most the given number of entries, the given stabilize cache and
+       the given request for branch and bound, and with all statistics at zero.
+       - The state is not part of a parallel search.
+       ASSUMPTIONS
+       - The given arguments satisfy all the assumptions of get_top_moves.
+    """
+    return {"transposition_table":
+                Cache.make_cache(transposition_table_size) if transposition_table_size > 0 else None,
+            "stabilize_cache": stabilize_cache,
+            "branch_and_bound": branch_and_bound,
+            "statistics": {"nodes_expanded": 0, "nodes_pruned": 0, "duplicates": 0},
+            "shared_solution_length": None,
+            "nb_of_blocks": None}
+
+
+def search_top_moves(board, blocks, min_score, max_nb_moves, level, score, search):
+    """
+       Compute the best possible moves to play the game on the given board as
+       described for get_top_moves, using the given search state.
+       - The given search state is a dictionary. Its entry "transposition_table"
+         is either None or a cache mapping the state of a search to its outcome
+         (see search_key). Its entry "stabilize_cache" is passed to stabilize_board.
+         Its entry "branch_and_bound" tells whether states from which the minimal
+         score cannot be reached are pruned. Its entry "statistics" is a dictionary
+         counting the states that have been expanded and pruned.
+       - In a worker process of a parallel search, the entry "shared_solution_length"
+         of the given search state is the value shared by all workers as the length
+         of the shortest solution found so far, and its entry "nb_of_blocks" is the
+         number of elements in the list of blocks at the start of the parallel search.
+         Each state only searches for solutions that are not longer than the
+         shortest solution found so far, taking into account the moves that lead
+         to it (one for each element of the list of blocks that has been used). Both
+         entries are None otherwise.
+       - Moves leading to the same stabilized board with the same level and the same
+         score as an earlier move are not explored (see get_outcome_key). They are
+         counted in the statistics as duplicates. Moves after which the board is
+         still stable are recognized without stabilizing the board (see
+         move_and_stabilize).
+       ASSUMPTIONS
+       - The given arguments satisfy all the assumptions of get_top_moves.
+       - The transposition table in the given search state is only used for
+         searches with the same minimal score and the same list of blocks.
+       - The value shared as the length of the shortest solution found so far
+         never increases during the search.
+    """
+    if search["shared_solution_length"] is not None:
+        # Other workers may have found shorter solutions since this search started.
+        max_nb_moves = min(max_nb_moves, search["shared_solution_length"].value -
+                           (search["nb_of_blocks"] - len(blocks)))
     if (score >= min_score) and (max_nb_moves >= 0):
         return []
     if (len(blocks) == 0) or (max_nb_moves <= 0) or (not Board.is_empty_row(board, "X")):
         return None
     assert isinstance(level, int) and (level >= 0)
     assert isinstance(score, int) and (score >= 0)
-    board_after_push_up = Board.copy_board(board)
-    Board.push_all_blocks_up(board_after_push_up)
+    transposition_table = search["transposition_table"]
+    if transposition_table is not None:
+        key = search_key(board, blocks, level, score)
+        known_outcome = Cache.lookup(transposition_table, key)
+        if known_outcome is not None:
+            is_solution, outcome = known_outcome
+            if is_solution and (len(outcome) <= max_nb_moves):
+                return replay_top_moves(board, blocks, outcome)
+            if is_solution or (max_nb_moves <= outcome):
+                return None
+        max_nb_moves_on_entry = max_nb_moves
+    if search["branch_and_bound"] and \
+            (get_score_upper_bound(board, blocks, max_nb_moves, level, score) < min_score):
+        search["statistics"]["nodes_pruned"] += 1
+        return None
+    search["statistics"]["nodes_expanded"] += 1
+    # All changes to the given board and the given list of blocks are undone
+    # before returning, also if the search is interrupted by an exception.
+    Board.set_checkpoint(board)
     blocks_to_fill_bottom_row = list.pop(blocks, 0)
-    for (leftmost_position, block) in blocks_to_fill_bottom_row:
-        Board.add_block_at(board_after_push_up, block, leftmost_position)
-    level, score = \
-        stabilize_board(level, score, board_after_push_up)
-    top_solution_so_far = None
-    for block in Board.get_all_blocks(board_after_push_up):
-        for nb_steps in get_all_possible_steps(board_after_push_up, block):
-            copy_board = Board.copy_board(board_after_push_up)
-            Board.move_block_horizontally(copy_board, block, nb_steps)
-            level_after_move, score_after_move = stabilize_board(level, score, copy_board)
-            best_solution_from_current_move = \
-                get_top_moves(copy_board, blocks, min_score, max_nb_moves - 1, level_after_move, score_after_move)
-            if (best_solution_from_current_move is not None):
-                best_solution_from_current_move.insert\
-                    (0, (Board.get_leftmost_position_of(board_after_push_up,block), block, nb_steps))
-                top_solution_so_far = best_solution_from_current_move
-                max_nb_moves = len(top_solution_so_far) - 1
-    list.insert(blocks, 0, blocks_to_fill_bottom_row)
+    try:
+        Board.push_all_blocks_up(board)
+        for (leftmost_position, block) in blocks_to_fill_bottom_row:
+            Board.add_block_at(board, block, leftmost_position)
+        level, score = \
+            stabilize_board(level, score, board, search["stabilize_cache"])
+        top_solution_so_far = None
+        outcomes_so_far = set()
+        Board.set_checkpoint(board)
+        try:
+            for block in Board.get_all_blocks(board):
+                for nb_steps in get_all_possible_steps(board, block):
+                    position_of_block = Board.get_leftmost_position_of(board, block)
+                    level_after_move, score_after_move = \
+                        move_and_stabilize(level, score, board, block, nb_steps, search["stabilize_cache"])
+                    outcome = get_outcome_key(board, level_after_move, score_after_move)
+                    if outcome in outcomes_so_far:
+                        search["statistics"]["duplicates"] += 1
+                        Board.rollback_to_checkpoint(board)
+                        continue
+                    set.add(outcomes_so_far, outcome)
+                    best_solution_from_current_move = \
+                        search_top_moves(board, blocks, min_score, max_nb_moves - 1,
+                                         level_after_move, score_after_move, search)
+                    Board.rollback_to_checkpoint(board)
+                    if (best_solution_from_current_move is not None):
+                        best_solution_from_current_move.insert\
+                            (0, (position_of_block, block, nb_steps))
+                        top_solution_so_far = best_solution_from_current_move
+                        max_nb_moves = len(top_solution_so_far) - 1
+        finally:
+            Board.rollback_to_checkpoint(board)
+            Board.release_checkpoint(board)
+    finally:
+        Board.rollback_to_checkpoint(board)
+        Board.release_checkpoint(board)
+        list.insert(blocks, 0, blocks_to_fill_bottom_row)
+    if transposition_table is not None:
+        if top_solution_so_far is None:
+            Cache.store(transposition_table, key, (False, max_nb_moves_on_entry))
+        else:
+            Cache.store(transposition_table, key,
+                        (True, tuple((position, nb_steps) for (position, _, nb_steps) in top_solution_so_far)))
     return top_solution_so_far
 
 
+def get_outcome_key(board, level, score):
+    """
+       Return a key identifying the outcome of a move on the given board, resulting
+       in the given level and the given score.
+       - Two moves have the same outcome if they lead to boards with the same blocks
+         at the same positions, compared by value (see Board.get_state_hash), with
+         the same level and the same score. Everything that follows is the same
+         for both moves, so only the first of them in the order of exploration
+         must be explored. That move is also the one the tie-break rules prefer.
+       ASSUMPTIONS
+       - The given board is a proper board.
+    """
+    return (Board.get_state_hash(board), level, score)
+
+
+def get_max_points_of(block):
+    """
+        Return a tuple consisting of the highest possible number of points the
+        given block can yield by exploding, followed by the highest possible number
+        of cells involved in explosions of the given block.
+        - An ordinary or an electrified block yields its length when it explodes
+          (the points of blocks exploding as a result of an electrified block
+          exploding are yielded by those blocks). A fragile block yields twice its
+          length, and the blocks replacing it occupy the same cells and may explode
+          later on.
+        ASSUMPTIONS
+        - The given block is a proper block.
+    """
+    max_points = Block.get_length(block)
+    max_nb_exploding_cells = Block.get_length(block)
+    if Block.get_type(block) == Block.FRAGILE:
+        max_points += Block.get_length(block)
+        for replacing_block in Block.split_block(block):
+            if Block.get_length(replacing_block) > 0:
+                points, nb_exploding_cells = get_max_points_of(replacing_block)
+                max_points += points
+                max_nb_exploding_cells += nb_exploding_cells
+    return (max_points, max_nb_exploding_cells)
+
+
+def get_score_upper_bound(board, blocks, max_nb_moves, level, score):
+    """
+        Return an upper bound for the score that can be reached on the given board
+        starting from the given level and the given score using the given blocks to
+        fill the bottom row in each step of the game, in no more than the given
+        maximum number of moves (see get_top_moves).
+        - Only the blocks on the given board and the blocks used to fill the bottom
+          row in the given number of moves can explode. Each round of explosions
+          yields the points of the exploding blocks (see get_max_points_of), times
+          the number of full rows, times the level.
+        - Each full row that explodes involves as many cells as there are columns,
+          which bounds the total number of exploding rows by the number of cells
+          involved in explosions divided by the number of columns. That total also
+          bounds the number of full rows in a single round, as well as the number
+          of rounds, and therefore the number of times the level increases.
+        ASSUMPTIONS
+        - The given arguments satisfy all the assumptions of get_top_moves.
+    """
+    dimension = Board.get_dimension(board)
+    all_blocks = Board.get_all_blocks(board)
+    for blocks_to_fill_bottom_row in blocks[:max(0, max_nb_moves)]:
+        list.extend(all_blocks, [block for (_, block) in blocks_to_fill_bottom_row])
+    total_points, total_nb_exploding_cells = 0, 0
+    for block in all_blocks:
+        points, nb_exploding_cells = get_max_points_of(block)
+        total_points += points
+        total_nb_exploding_cells += nb_exploding_cells
+    max_nb_exploding_rows = \
+        total_nb_exploding_cells // Dimension.get_nb_of_columns(dimension)
+    if max_nb_exploding_rows == 0:
+        return score
+    max_nb_full_rows = min(Dimension.get_nb_of_rows(dimension), max_nb_exploding_rows)
+    return score + \
+        total_points * max_nb_full_rows * (level + max_nb_exploding_rows - 1)
+
+
+def search_key(board, blocks, level, score):
+    """
+       Return the key under which the outcome of a search for the best possible moves
+       on the given board starting from the given level and the given score using the
+       given blocks is stored in a transposition table.
+       - The outcome of such a search only depends on the values (and not on the
+         identity) of the blocks on the board. Moreover, if the search finds a
+         solution, that solution is the same for all maximum numbers of moves that
+         are not less than its length. Outcomes are therefore stored as a tuple
+         (True, M) in which M is a tuple of the leftmost positions and the distances
+         of the moves in the solution, or as a tuple (False, N) expressing that no
+         solution exists in N moves or less.
+       ASSUMPTIONS
+       - The given board is a proper board.
+       - The given blocks are the blocks that remain of the list of blocks that is
+         used throughout the search.
+    """
+    return (Board.get_state_hash(board), len(blocks), level, score)
+
+
+def replay_top_moves(board, blocks, moves):
+    """
+       Return the solution for get_top_moves on the given board with the given blocks
+       consisting of the given moves.
+       - The given moves are collected in a sequence of tuples consisting of the
+         leftmost position of the block to move followed by the distance to move it
+         over. The function looks up the blocks involved by playing the moves.
+       - Upon exit, the given board and the given list of blocks are in the same
+         state they were in upon entry.
+       ASSUMPTIONS
+       - The given board is a proper and stable board.
+       - The given moves are a solution found by get_top_moves for a board in the
+         same state as the given board, using the same blocks.
+    """
+    solution = []
+    Board.set_checkpoint(board)
+    try:
+        for index in range(0, len(moves)):
+            position, nb_steps = moves[index]
+            Board.push_all_blocks_up(board)
+            for (leftmost_position, block) in blocks[index]:
+                Board.add_block_at(board, block, leftmost_position)
+            stabilize_board(1, 0, board)
+            block = Board.get_block_at(board, position)
+            list.append(solution, (position, block, nb_steps))
+            Board.move_block_horizontally(board, block, nb_steps)
+            stabilize_board(1, 0, board)
+    finally:
+        Board.rollback_to_checkpoint(board)
+        Board.release_checkpoint(board)
+    return solution
+
+
+# The length of the shortest solution found so far by any of the worker processes
+# of a parallel search (shared among those processes).
+shared_solution_length = None
+
+
+def set_shared_solution_length(solution_length):
+    """
+        Register the given shared value as the length of the shortest solution found
+        so far in a parallel search.
+        - This function initializes each worker process of a pool (see get_process_pool).
+    """
+    global shared_solution_length
+    shared_solution_length = solution_length
+
+
+def search_top_moves_in_parallel(board, blocks, min_score, max_nb_moves, level, score, search,
+                                 transposition_table_size, nb_workers, split_depth):
+    """
+       Compute the best possible moves to play the game on the given board as
+       described for get_top_moves, using a pool of the given number of worker
+       processes (see get_process_pool).
+       - The search tree is expanded in the calling process up to the given split
+         depth. The subtree after each sequence of moves of that length is searched
+         in one of the worker processes.
+       - The workers share the length of the shortest solution found so far, and
+         do not search for longer solutions. Each state a worker expands checks that
+         length again, such that searches in progress are cut short as soon as some
+         other worker finds a shorter solution. Solutions of the same length are still
+         searched for, because the sequential search prefers the one that comes
+         first in the order in which moves are explored.
+       - Of all the solutions found, the function returns the shortest one that
+         comes first in the order of exploration. This is the solution the sequential
+         search returns.
+       - The workers use branch and bound as registered in the given search state,
+         and add their statistics to the statistics in it.
+       - If the search does not complete, the pool is discarded (see
+         discard_process_pool), such that subtrees still being searched do not
+         interfere with later searches.
+       ASSUMPTIONS
+       - The given arguments satisfy all the assumptions of get_top_moves.
+       - The given number of workers and the given split depth are positive integer
+         numbers.
+       - No other parallel search uses a pool of the given number of workers at the
+         same time.
+    """
+    frontier = []
+    collect_search_frontier(board, blocks, min_score, max_nb_moves, level, score, split_depth, [], frontier)
+    pool = get_process_pool(nb_workers)
+    solution_length = process_pools[nb_workers][1]
+    solution_length.value = max_nb_moves + 1
+    # Solutions found while expanding the search tree are shared as well.
+    for (moves, state) in frontier:
+        if state is None:
+            solution_length.value = min(solution_length.value, len(moves))
+    try:
+        outcomes = []
+        for (moves, state) in frontier:
+            if state is None:
+                list.append(outcomes, moves)
+            else:
+                placements, level_after_moves, score_after_moves = state
+                list.append(outcomes, pool.submit(
+                    search_subtree, Board.get_dimension(board), placements, blocks[len(moves):], min_score,
+                    max_nb_moves - len(moves), level_after_moves, score_after_moves, len(moves),
+                    transposition_table_size, search["branch_and_bound"]))
+        top_solution_so_far = None
+        for index in range(0, len(frontier)):
+            moves, state = frontier[index]
+            if state is None:
+                solution = moves
+            else:
+                remaining_moves, statistics = outcomes[index].result()
+                for name in statistics:
+                    search["statistics"][name] += statistics[name]
+                solution = None if remaining_moves is None else moves + list(remaining_moves)
+            if (solution is not None) and \
+                    ((top_solution_so_far is None) or (len(solution) < len(top_solution_so_far))):
+                top_solution_so_far = solution
+    except BaseException:
+        discard_process_pool(pool)
+        raise
+    if top_solution_so_far is None:
+        return None
+    return replay_top_moves(board, blocks, top_solution_so_far)
+
+
+def collect_search_frontier(board, blocks, min_score, max_nb_moves, level, score, depth, moves, frontier):
+    """
+       Explore the moves to play the game on the given board as described for
+       get_top_moves, up to the given depth, and collect the states reached in the
+       given frontier.
+       - The given moves are the moves that lead to the given board. They are
+         collected in a list of tuples consisting of the leftmost position of the
+         block to move followed by the distance to move it over.
+       - The function appends a tuple to the given frontier for each sequence of moves
+         that reaches the given minimal score, and for each sequence of moves whose
+         length is equal to the given depth (added to the given moves). These tuples
+         consist of the sequence of moves followed by None if that sequence reaches
+         the minimal score, or followed by a tuple with the placements of the blocks
+         on the board after that sequence (see Board.get_all_placements), the level
+         and the score otherwise. They are appended in the order in which
+         get_top_moves explores the moves. Moves with the same outcome as an earlier
+         move are skipped, as get_top_moves skips them.
+       - Upon exit, the given board and the given list of blocks are in the same
+         state they were in upon entry.
+       ASSUMPTIONS
+       - The given arguments satisfy all the assumptions of get_top_moves.
+       - The given depth is a non-negative integer number.
+    """
+    if (score >= min_score) and (max_nb_moves >= 0):
+        list.append(frontier, (moves, None))
+        return
+    if (len(blocks) == 0) or (max_nb_moves <= 0) or (not Board.is_empty_row(board, "X")):
+        return
+    if depth == 0:
+        list.append(frontier, (moves, (Board.get_all_placements(board), level, score)))
+        return
+    # As in search_top_moves, all changes are undone also if an exception occurs.
+    Board.set_checkpoint(board)
+    blocks_to_fill_bottom_row = list.pop(blocks, 0)
+    try:
+        Board.push_all_blocks_up(board)
+        for (leftmost_position, block) in blocks_to_fill_bottom_row:
+            Board.add_block_at(board, block, leftmost_position)
+        level, score = stabilize_board(level, score, board)
+        outcomes_so_far = set()
+        Board.set_checkpoint(board)
+        try:
+            for block in Board.get_all_blocks(board):
+                for nb_steps in get_all_possible_steps(board, block):
+                    position_of_block = Board.get_leftmost_position_of(board, block)
+                    level_after_move, score_after_move = move_and_stabilize(level, score, board, block, nb_steps)
+                    outcome = get_outcome_key(board, level_after_move, score_after_move)
+                    if outcome in outcomes_so_far:
+                        Board.rollback_to_checkpoint(board)
+                        continue
+                    set.add(outcomes_so_far, outcome)
+                    collect_search_frontier(board, blocks, min_score, max_nb_moves - 1, level_after_move,
+                                            score_after_move, depth - 1, moves + [(position_of_block, nb_steps)],
+                                            frontier)
+                    Board.rollback_to_checkpoint(board)
+        finally:
+            Board.rollback_to_checkpoint(board)
+            Board.release_checkpoint(board)
+    finally:
+        Board.rollback_to_checkpoint(board)
+        Board.release_checkpoint(board)
+        list.insert(blocks, 0, blocks_to_fill_bottom_row)
+
+
+def search_subtree(dimension, placements, blocks, min_score, max_nb_moves, level, score, nb_moves_made,
+                   transposition_table_size, branch_and_bound):
+    """
+       Return the moves found by get_top_moves on a board with the given dimension
+       loaded with the given blocks, as a tuple of tuples consisting of the leftmost
+       position of the block to move followed by the distance to move it over,
+       followed by the statistics of the search.
+       - The given placements of blocks are structured as described for
+         Board.get_all_placements. The other arguments are as described for
+         get_top_moves.
+       - The search is part of a parallel search in which the given number of
+         moves has already been made. It is restricted to solutions that are not
+         longer than the shortest solution found so far, and it registers the
+         length of the solution it finds as such.
+       ASSUMPTIONS
+       - The process executing this function is a worker process of a parallel
+         search (see search_top_moves_in_parallel).
+    """
+    board = Board.make_board(dimension)
+    for (position, block) in placements:
+        Board.add_block_at(board, block, position)
+    search = make_search_state(transposition_table_size, None, branch_and_bound)
+    search["shared_solution_length"] = shared_solution_length
+    search["nb_of_blocks"] = nb_moves_made + len(blocks)
+    solution = search_top_moves(board, blocks, min_score, max_nb_moves, level, score, search)
+    if solution is None:
+        return (None, search["statistics"])
+    with shared_solution_length.get_lock():
+        shared_solution_length.value = min(shared_solution_length.value, nb_moves_made + len(solution))
+    return (tuple((position, nb_steps) for (position, _, nb_steps) in solution), search["statistics"])
+
+
 def let_player_move_block(board):
     """
         Let the player move one of the blocks on the given board.
+        - The function returns a tuple consisting of the leftmost position of the
+          block that has been moved, taken before it moved, followed by the distance
+          it has been moved over.
         ASSUMPTIONS
         - The given board is a proper board.
         - The bottom row of the given board is not empty.
@@ -290,10 +1093,12 @@ def let_player_move_block(board):
             else:
                 block_to_move = the_block
                 distance_to_move_over = players_distance
+    position_of_block = Board.get_leftmost_position_of(board, block_to_move)
     Board.move_block_horizontally(board, block_to_move, distance_to_move_over)
+    return (position_of_block, distance_to_move_over)
 
 
-def play_keyboard(blocks = [], nb_rows=10, nb_columns=8):
+def play_keyboard(blocks = [], nb_rows=10, nb_columns=8, incremental=None, recorder=None):
     """
         Function to play the game on a board with the given number of rows and the
         given number of columns via the keyboard, using the given blocks to fill
@@ -302,16 +1107,28 @@ def play_keyboard(blocks = [], nb_rows=10, nb_columns=8):
          blocks to fill the bottom row once. The function will first use elements from
          that list until the list is exhausted. From that point on, the function will
          generate blocks to fill the bottom row in a random way.
+       - The board is drawn by a renderer (see Renderer.make_renderer), together with
+         the score and the level. If incremental is None, the renderer redraws only
+         the lines that changed if the standard output stream is a terminal.
+       - If a recorder is given, each row of blocks, whether given or generated, and
+         each move is recorded (see Recording.make_recorder).
         ASSUMPTIONS
         - The given number of rows and the given number of columns are integer numbers
           greater than 1.
     """
+    import sys
+    import Renderer
+    if incremental is None:
+        incremental = sys.stdout.isatty()
+    renderer = Renderer.make_renderer(incremental=incremental)
     score = 0
     level = 1
     the_board = Board.make_board((nb_rows, nb_columns))
     while Board.is_empty_row(the_board, "X"):
         if len(blocks) > 0:
             Board.insert_bottom_row(the_board,blocks.pop(0))
+            if recorder is not None:
+                Recording.record_row(recorder, the_board, Recording.INSERTED_ROW)
         else:
             Board.push_all_blocks_up(the_board)
             max_block_length = max(2, \
@@ -319,11 +1136,15 @@ def play_keyboard(blocks = [], nb_rows=10, nb_columns=8):
                                    round(nb_columns / 3) if level <= 6 else
                                    round(nb_columns / 2))
             Board.fill_bottom_row(the_board, max_block_length)
+            if recorder is not None:
+                Recording.record_row(recorder, the_board, Recording.FILLED_ROW)
         level, score = stabilize_board(level, score, the_board)
-        Board.print_board(the_board)
-        let_player_move_block(the_board)
+        Renderer.draw(renderer, the_board, ["Score:  " + str(score) + " [level:  " + str(level) + " ]"])
+        position_of_block, nb_steps = let_player_move_block(the_board)
+        if recorder is not None:
+            Recording.record_move(recorder, position_of_block, nb_steps)
         level, score = stabilize_board(level, score, the_board)
-        print("Score: ", score, "[level: ", level, "]")
+    Renderer.draw(renderer, the_board, ["Score:  " + str(score) + " [level:  " + str(level) + " ]"])
     print("Einde spel!")
 
 
@@ -0,0 +1,181 @@
+# Instrumentation counts the calls of functions in other modules and the time
+# spent in them, and records metrics of the functions playing the game. It is
+# switched off by default. While it is switched off, the instrumented functions
+# are the original functions, and recording metrics only costs a test of the
+# flag enabled.
+# Only calls in the process that enabled instrumentation are counted; calls in
+# worker processes are not.
+
+# The functions that are instrumented by default, per module. Searches explore
+# moves by setting checkpoints on a board and rolling back to them, instead of
+# copying boards. The number of changes undone by rolling back is recorded as
+# a metric of Board.rollback_to_checkpoint.
+DEFAULT_FUNCTIONS = {"Board": ("get_leftmost_position_of", "contains_block", "get_all_blocks",
+                               "let_all_blocks_fall", "let_all_explode",
+                               "set_checkpoint", "rollback_to_checkpoint"),
+                     "Game": ("stabilize_board", "get_move_with_highest_score", "play_greedy",
+                              "get_top_moves", "search_top_moves")}
+
+# True if and only if instrumentation is switched on.
+enabled = False
+
+# The original functions that have been replaced, per qualified name
+# (the name of the module, followed by a dot and the name of the function).
+original_functions = {}
+
+# Counters per qualified name of a function. Each counter is a list consisting
+# of the number of calls, the total time in seconds, the number of activations
+# in progress, and a dictionary of metrics.
+counters = {}
+
+
+def get_counter(qualified_name):
+    """
+        Return the counter for the function with the given qualified name, after
+        creating it if it does not exist yet.
+    """
+    counter = dict.get(counters, qualified_name, None)
+    if counter is None:
+        counter = [0, 0.0, 0, {}]
+        counters[qualified_name] = counter
+    return counter
+
+
+def make_instrumented_function(qualified_name, function):
+    """
+        Return a function doing the same as the given function, that also counts its
+        calls and the time spent in them in the counter for the given qualified name.
+        - Only the outermost activation of a recursive function is timed, such that
+          the total time is the time spent in that function, including the time
+          spent in recursive calls, counted once.
+    """
+    import functools
+    import time
+    counter = get_counter(qualified_name)
+
+    def instrumented_function(*args, **kwargs):
+        counter[0] += 1
+        counter[2] += 1
+        if counter[2] > 1:
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter[2] -= 1
+        start_time = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter[1] += time.perf_counter() - start_time
+            counter[2] -= 1
+
+    return functools.update_wrapper(instrumented_function, function)
+
+
+def enable(functions=None):
+    """
+        Switch instrumentation on for the given functions.
+        - The given functions are collected in a dictionary mapping names of modules
+          to sequences of names of functions in those modules. If no functions are
+          given, DEFAULT_FUNCTIONS are instrumented.
+        - Each function is replaced in its module by a function that counts its calls
+          and the time spent in it. Calls from within the module itself, and calls
+          through the module from other modules, are all counted.
+        - Functions that are already instrumented are left untouched.
+        ASSUMPTIONS
+        - Each of the given modules can be imported, and holds each of the
+          functions given for it.
+    """
+    import importlib
+    global enabled
+    if functions is None:
+        functions = DEFAULT_FUNCTIONS
+    for module_name in functions:
+        module = importlib.import_module(module_name)
+        for function_name in functions[module_name]:
+            qualified_name = module_name + "." + function_name
+            if qualified_name not in original_functions:
+                function = getattr(module, function_name)
+                original_functions[qualified_name] = function
+                setattr(module, function_name, make_instrumented_function(qualified_name, function))
+    enabled = True
+
+
+def disable():
+    """
+        Switch instrumentation off, and restore all the original functions.
+        - The counters are not reset.
+    """
+    import importlib
+    global enabled
+    enabled = False
+    for qualified_name in original_functions:
+        module_name, function_name = str.rsplit(qualified_name, ".", 1)
+        setattr(importlib.import_module(module_name), function_name, original_functions[qualified_name])
+    dict.clear(original_functions)
+
+
+def is_enabled():
+    """
+        Check whether instrumentation is switched on.
+    """
+    return enabled
+
+
+def record(qualified_name, metric, amount=1):
+    """
+        Add the given amount to the given metric of the function with the given
+        qualified name.
+        - Callers are expected to test the flag enabled first, such that nothing
+          is computed for metrics while instrumentation is switched off.
+    """
+    metrics = get_counter(qualified_name)[3]
+    metrics[metric] = dict.get(metrics, metric, 0) + amount
+
+
+def reset():
+    """
+        Reset all counters and all metrics to zero.
+    """
+    for counter in counters.values():
+        counter[0], counter[1] = 0, 0.0
+        dict.clear(counter[3])
+
+
+def snapshot():
+    """
+        Return a dictionary with the current state of all counters.
+        - The resulting dictionary maps the qualified name of each function that has
+          been called or for which metrics have been recorded, to a dictionary
+          mapping "nb_calls" to the number of calls, "total_time" to the total time
+          in seconds spent in those calls, and the name of each metric to its value.
+          For each metric, the average value per call is mapped to by its name
+          followed by "_per_call".
+        - The resulting dictionary does not change afterwards.
+    """
+    result = {}
+    for qualified_name in counters:
+        nb_calls, total_time, _, metrics = counters[qualified_name]
+        if (nb_calls == 0) and (len(metrics) == 0):
+            continue
+        statistics = {"nb_calls": nb_calls, "total_time": total_time}
+        for metric in metrics:
+            statistics[metric] = metrics[metric]
+            if nb_calls > 0:
+                statistics[metric + "_per_call"] = metrics[metric] / nb_calls
+        result[qualified_name] = statistics
+    return result
+
+
+def print_snapshot():
+    """
+        Print the current state of all counters, the functions in which most time
+        has been spent first.
+    """
+    statistics_per_function = snapshot()
+    for qualified_name in sorted(statistics_per_function,
+                                 key=lambda name: -statistics_per_function[name]["total_time"]):
+        statistics = statistics_per_function[qualified_name]
+        print("%-36s %10d calls %10.6f s" % (qualified_name, statistics["nb_calls"], statistics["total_time"]))
+        for metric in sorted(statistics):
+            if metric not in ("nb_calls", "total_time"):
+                print("    %-32s %14.2f" % (metric, statistics[metric]))
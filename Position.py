@@ -1,6 +1,36 @@
 # Positions are used to identify cells on the board
 import Dimension
 
+# Tables of positions, built once for each dimension (see get_position_table).
+position_tables_per_dimension = {}
+
+
+def get_position_table(dimension):
+    """
+        Return a table of all the positions on any board with the given dimension.
+        - The table is a tuple consisting of a tuple of all the positions in the
+          order of their cell index (see cell_index), followed by a dictionary
+          mapping each of these positions to its cell index.
+        - The table is built the first time it is requested for the given dimension,
+          and reused afterwards. Functions in this module return the positions
+          stored in the table, such that no new positions are built for positions
+          within the boundaries of the given dimension.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+    """
+    table = dict.get(position_tables_per_dimension, dimension, None)
+    if table is None:
+        nb_rows, nb_cols = dimension
+        all_positions = tuple((id_of_row(dimension, row_nb), col)
+                              for row_nb in range(1, nb_rows + 1) for col in range(1, nb_cols + 1))
+        indices = {}
+        for index in range(0, len(all_positions)):
+            indices[all_positions[index]] = index
+        table = (all_positions, indices)
+        position_tables_per_dimension[dimension] = table
+    return table
+
+
 def is_proper_position(position):
     """
         Check whether the given position is a proper position.
@@ -109,8 +139,11 @@ def left(dimension, position, nb_steps = 1):
     row, col = position
     if col - nb_steps < 1:
         return None
-    else:
+    all_positions, indices = get_position_table(dimension)
+    index = dict.get(indices, position, None)
+    if index is None:
         return (row,col-nb_steps)
+    return all_positions[index - nb_steps]
 
 
 def right(dimension, position, nb_steps = 1):
@@ -129,8 +162,11 @@ def right(dimension, position, nb_steps = 1):
     row, col = position
     if col + nb_steps > nb_cols:
         return None
-    else:
+    all_positions, indices = get_position_table(dimension)
+    index = dict.get(indices, position, None)
+    if index is None:
         return (row,col+nb_steps)
+    return all_positions[index + nb_steps]
 
 
 def up(dimension, position, nb_steps=1):
@@ -145,7 +181,13 @@ def up(dimension, position, nb_steps=1):
           any board with the given dimension.
         - The given number of steps is a positive integer number.
     """
-    nb_rows, _ = dimension
+    nb_rows, nb_cols = dimension
+    all_positions, indices = get_position_table(dimension)
+    index = dict.get(indices, position, None)
+    if index is not None:
+        if index + nb_steps * nb_cols >= len(all_positions):
+            return None
+        return all_positions[index + nb_steps * nb_cols]
     row, col = position
     if nb_of_row(dimension,get_row(position)) + nb_steps > nb_rows:
         return None
@@ -167,11 +209,63 @@ def down(dimension, position, nb_steps=1):
           any board with the given dimension.
         - The given number of steps is a positive integer number.
     """
-    nb_rows, _ = dimension
+    nb_rows, nb_cols = dimension
+    all_positions, indices = get_position_table(dimension)
+    index = dict.get(indices, position, None)
+    if index is not None:
+        if index - nb_steps * nb_cols < 0:
+            return None
+        return all_positions[index - nb_steps * nb_cols]
     row, col = position
-    if row == "X":
-        return (chr(ord("a")+nb_rows-2), col)
-    elif row != "a":
-        return (chr(ord(row)-1),col)
+    if nb_of_row(dimension,get_row(position)) - nb_steps < 1:
+        return None
     else:
+        return (id_of_row(dimension,nb_of_row(dimension,get_row(position)) - nb_steps),col)
+
+
+def cell_index(dimension, position):
+    """
+        Return the index of the cell at the given position in a flat sequence
+        storing all the cells of a board with the given dimension row by row.
+        - The cells of the bottom row have indices 0 up to the number of
+          columns minus 1, the cells of the next row follow, and so on.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given position is a proper position within the boundaries of
+          any board with the given dimension.
+    """
+    index = dict.get(get_position_table(dimension)[1], position, None)
+    if index is not None:
+        return index
+    return (nb_of_row(dimension, get_row(position)) - 1) * Dimension.get_nb_of_columns(dimension) + \
+           get_column(position) - 1
+
+
+def position_of_cell(dimension, index):
+    """
+        Return the position of the cell with the given index in a flat sequence
+        storing all the cells of a board with the given dimension row by row.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given index is a non-negative integer number less than the number
+          of cells of any board with the given dimension.
+    """
+    return get_position_table(dimension)[0][index]
+
+
+def position_at(dimension, row_nb, col):
+    """
+        Return the position in the row with the given number and the given column
+        on any board with the given dimension.
+        - The resulting position is the position stored in the table for the given
+          dimension (see get_position_table).
+        - None is returned if the row number or the column is outside the boundaries
+          of a board with the given dimension.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given row number and the given column are integer numbers.
+    """
+    nb_rows, nb_cols = dimension
+    if not ((1 <= row_nb <= nb_rows) and (1 <= col <= nb_cols)):
         return None
+    return get_position_table(dimension)[0][(row_nb - 1) * nb_cols + col - 1]
@@ -0,0 +1,253 @@
+# Recordings archive games in a compact binary format, such that they can be
+# replayed afterwards. A recording starts with a header, followed by a sequence
+# of events. All numbers are stored in little-endian byte order.
+# - The header consists of the magic bytes b"BLKR", the version of the format
+#   (1 byte) and the number of rows and the number of columns of the board
+#   (2 bytes each).
+# - An event starts with a single byte identifying its kind. A row event
+#   (INSERTED_ROW or FILLED_ROW) registers that all blocks were pushed up one
+#   row and that the bottom row was filled with new blocks. It holds the number
+#   of blocks (2 bytes), followed by the column (2 bytes), the length, the type
+#   and the color (1 byte each) of each block. A move event (MOVE) holds the
+#   number of the row (1 byte) and the column (2 bytes) of the leftmost position
+#   of the block that was moved, followed by the number of steps (2 bytes, signed).
+# Each turn of a game starts with a row event, and is followed by the moves made
+# in that turn. The board is stabilized after the row is added and after each move.
+import struct
+import Dimension
+import Position
+import Block
+import Board
+
+MAGIC   = b"BLKR"
+VERSION = 1
+
+# Kinds of events.
+INSERTED_ROW = 1
+FILLED_ROW   = 2
+MOVE         = 3
+
+HEADER_FORMAT = struct.Struct("<4sBHH")
+ROW_FORMAT    = struct.Struct("<BH")
+BLOCK_FORMAT  = struct.Struct("<HBBB")
+MOVE_FORMAT   = struct.Struct("<BBHh")
+
+
+def make_recorder(output, dimension):
+    """
+        Return a new recorder writing a recording of a game on a board with the
+        given dimension to the given binary output stream.
+        - The header of the recording is written immediately. Events are written
+          as they are recorded, such that the recording does not grow in memory.
+        - The recorder does not close the given output stream.
+        ASSUMPTIONS
+        - The given output stream is open for writing bytes.
+        - The given dimension is a proper dimension with less than 256 rows.
+    """
+    output.write(HEADER_FORMAT.pack(MAGIC, VERSION, Dimension.get_nb_of_rows(dimension),
+                                    Dimension.get_nb_of_columns(dimension)))
+    return (output, dimension)
+
+
+def record_row(recorder, board, kind=INSERTED_ROW):
+    """
+        Record an event of the given kind for the blocks that have just been added to
+        the bottom row of the given board.
+        - The kind is INSERTED_ROW for blocks given to Board.insert_bottom_row, and
+          FILLED_ROW for blocks generated by Board.fill_bottom_row.
+        ASSUMPTIONS
+        - The given recorder is a proper recorder for a board with the dimension
+          of the given board.
+        - The given board is a proper board that has not been stabilized since its
+          bottom row was filled.
+    """
+    output, dimension = recorder
+    blocks_in_row = Board.get_all_blocks_in_row(board, "a")
+    parts = [ROW_FORMAT.pack(kind, len(blocks_in_row))]
+    for block in blocks_in_row:
+        list.append(parts, BLOCK_FORMAT.pack(Position.get_column(Board.get_leftmost_position_of(board, block)),
+                                             Block.get_length(block), Block.get_type(block),
+                                             Block.get_color(block)))
+    output.write(b"".join(parts))
+
+
+def record_move(recorder, position, nb_steps):
+    """
+        Record the move of the block at the given leftmost position over the given
+        number of steps.
+        ASSUMPTIONS
+        - The given recorder is a proper recorder.
+        - The given position is the leftmost position of the block to move, taken
+          before it is moved.
+    """
+    output, dimension = recorder
+    output.write(MOVE_FORMAT.pack(MOVE, Position.nb_of_row(dimension, Position.get_row(position)),
+                                  Position.get_column(position), nb_steps))
+
+
+def read_recording(data):
+    """
+        Return a tuple consisting of the dimension of the board on which the game
+        recorded in the given bytes was played, followed by a list of the events in
+        that recording.
+        - A row event is a tuple consisting of its kind followed by a tuple of the
+          blocks to add to the bottom row, each described by a tuple of its column,
+          its length, its type and its color.
+        - A move event is a tuple consisting of MOVE followed by the leftmost position
+          of the block to move and the number of steps to move it over.
+        - A ValueError is raised if the given bytes are not a recording in a
+          version of the format this module can read, or if they record a move
+          from a position or a block at a position outside the boundaries of the
+          board.
+    """
+    if len(data) < HEADER_FORMAT.size:
+        raise ValueError("not a recording: too short")
+    magic, version, nb_rows, nb_columns = HEADER_FORMAT.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a recording: bad magic bytes")
+    if version != VERSION:
+        raise ValueError("unsupported version of recordings: " + str(version))
+    dimension = (nb_rows, nb_columns)
+    if not Dimension.is_proper_dimension(dimension):
+        raise ValueError("not a recording: improper dimension " + str(dimension))
+    events = []
+    offset = HEADER_FORMAT.size
+    try:
+        while offset < len(data):
+            kind = data[offset]
+            if kind == MOVE:
+                _, row_nb, column, nb_steps = MOVE_FORMAT.unpack_from(data, offset)
+                offset += MOVE_FORMAT.size
+                position = Position.position_at(dimension, row_nb, column)
+                if position is None:
+                    raise ValueError("move from outside the board: row " + str(row_nb) +
+                                     ", column " + str(column))
+                list.append(events, (MOVE, position, nb_steps))
+            elif kind in (INSERTED_ROW, FILLED_ROW):
+                _, nb_blocks = ROW_FORMAT.unpack_from(data, offset)
+                offset += ROW_FORMAT.size
+                blocks = tuple(BLOCK_FORMAT.iter_unpack(data[offset:offset + nb_blocks * BLOCK_FORMAT.size]))
+                if len(blocks) != nb_blocks:
+                    raise ValueError("truncated recording")
+                for (column, length, _, _) in blocks:
+                    if not ((column >= 1) and (length >= 1) and (column + length - 1 <= nb_columns)):
+                        raise ValueError("block outside the board: column " + str(column) +
+                                         ", length " + str(length))
+                offset += nb_blocks * BLOCK_FORMAT.size
+                list.append(events, (kind, blocks))
+            else:
+                raise ValueError("unknown kind of event: " + str(kind))
+    except struct.error:
+        raise ValueError("truncated recording")
+    return (dimension, events)
+
+
+def apply_event(board, level, score, event):
+    """
+        Apply the given event to the given board, stabilize it in view of the given
+        level and the given score, and return the updated level and score.
+        - Events are applied without checking whether they are valid. Moves are
+          not validated, and blocks are added without checking whether they fit.
+        ASSUMPTIONS
+        - The given event results from reading a recording of a game played on a
+          board in the same state as the given board (see read_recording).
+    """
+    import Game
+    dimension = Board.get_dimension(board)
+    if event[0] == MOVE:
+        _, position, nb_steps = event
+        block = Board.get_block_at(board, position)
+        new_position = Position.position_at(dimension, Position.nb_of_row(dimension, Position.get_row(position)),
+                                            Position.get_column(position) + nb_steps)
+        Board.remove_block_from(board, block)
+        Board.add_block_at(board, block, new_position)
+    else:
+        Board.push_all_blocks_up(board)
+        for (column, length, type, color) in event[1]:
+            Board.add_block_at(board, Block.make_block(length, type, color), Position.position_at(dimension, 1, column))
+    return Game.stabilize_board(level, score, board)
+
+
+def make_replayer(data, snapshot_interval=16):
+    """
+        Return a new replayer for the game recorded in the given bytes.
+        - A replayer replays the recorded game turn by turn. Turn 0 is the start of
+          the game on an empty board; turn T is the state of the game after the row
+          event of the T-th turn and all the moves that follow it.
+        - Every given number of turns, the replayer keeps a snapshot of the board,
+          the level and the score in memory, such that it can jump to any turn
+          without replaying the game from the start (see jump_to).
+        - The resulting replayer is positioned at turn 0.
+        ASSUMPTIONS
+        - The given snapshot interval is a positive integer number.
+    """
+    dimension, events = read_recording(data)
+    # The index in the list of events at which each turn starts.
+    turn_starts = [index for index in range(0, len(events)) if events[index][0] != MOVE]
+    list.append(turn_starts, len(events))
+    board = Board.make_board(dimension)
+    snapshots = {0: (Board.copy_board(board), 1, 0)}
+    # The current state consists of the turn, the board, the level and the score.
+    return {"events": events, "turn_starts": turn_starts, "snapshot_interval": snapshot_interval,
+            "snapshots": snapshots, "turn": 0, "board": board, "level": 1, "score": 0}
+
+
+def get_nb_of_turns(replayer):
+    """
+        Return the number of turns in the game replayed by the given replayer.
+    """
+    return len(replayer["turn_starts"]) - 1
+
+
+def get_state(replayer):
+    """
+        Return a tuple consisting of the current turn of the given replayer, followed
+        by its board, its level and its score.
+        - The board is the board of the replayer. It must not be changed.
+    """
+    return (replayer["turn"], replayer["board"], replayer["level"], replayer["score"])
+
+
+def advance(replayer, nb_turns=1):
+    """
+        Replay the given number of turns from the current turn of the given replayer.
+        - Replaying stops at the last turn of the game.
+        - Snapshots are taken at each turn that is a multiple of the snapshot interval
+          of the given replayer, unless they have been taken before.
+    """
+    events, turn_starts = replayer["events"], replayer["turn_starts"]
+    board, level, score = replayer["board"], replayer["level"], replayer["score"]
+    last_turn = min(replayer["turn"] + nb_turns, get_nb_of_turns(replayer))
+    for turn in range(replayer["turn"], last_turn):
+        for index in range(turn_starts[turn], turn_starts[turn + 1]):
+            level, score = apply_event(board, level, score, events[index])
+        if ((turn + 1) % replayer["snapshot_interval"] == 0) and (turn + 1 not in replayer["snapshots"]):
+            replayer["snapshots"][turn + 1] = (Board.copy_board(board), level, score)
+    replayer["turn"], replayer["level"], replayer["score"] = max(replayer["turn"], last_turn), level, score
+
+
+def jump_to(replayer, turn):
+    """
+        Bring the given replayer to the given turn.
+        - The replayer starts from the closest snapshot at or before the given turn,
+          unless the current turn is closer, and replays the remaining turns.
+        ASSUMPTIONS
+        - The given turn is a non-negative integer number not exceeding the number
+          of turns in the game.
+    """
+    snapshot_turn = max([snapshot_turn for snapshot_turn in replayer["snapshots"] if snapshot_turn <= turn])
+    if (turn < replayer["turn"]) or (snapshot_turn > replayer["turn"]):
+        snapshot_board, level, score = replayer["snapshots"][snapshot_turn]
+        replayer["turn"], replayer["board"], replayer["level"], replayer["score"] = \
+            snapshot_turn, Board.copy_board(snapshot_board), level, score
+    advance(replayer, turn - replayer["turn"])
+
+
+def replay(data):
+    """
+        Replay the game recorded in the given bytes, and return a tuple consisting
+        of the final board, followed by the final level and the final score.
+    """
+    replayer = make_replayer(data, snapshot_interval=1 << 30)
+    advance(replayer, get_nb_of_turns(replayer))
+    return (replayer["board"], replayer["level"], replayer["score"])
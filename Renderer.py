@@ -0,0 +1,150 @@
+# Renderers draw boards on a terminal. Each frame is built as a single string
+# and written at once. In incremental mode, only the lines that changed since
+# the previous frame are redrawn, using escape sequences to position the cursor.
+import Dimension
+import Position
+import Block
+import Board
+
+
+def render_board_lines(board):
+    """
+        Return a list of the lines to display the given board on a terminal.
+        - The lines do not end in a newline. They include the escape sequences
+          to color the blocks, and are the same lines Board.print_board prints.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    dimension = Board.get_dimension(board)
+    nb_columns = Dimension.get_nb_of_columns(dimension)
+    lines = []
+    for row_nb in range(Dimension.get_nb_of_rows(dimension), 0, -1):
+        row = Position.id_of_row(dimension, row_nb)
+        row_blocks = Board.get_all_blocks_in_row(board, row)
+        for is_row_line in (False, True):
+            if is_row_line:
+                parts = ["\033[1;31;48m" + '{:2}'.format(row) + "  "]
+            else:
+                parts = ["\033[1;30;48m" + "  " + "  "]
+            column = 1
+            for block in row_blocks + [None]:
+                next_column = nb_columns + 1 if block is None else \
+                    Position.get_column(Board.get_leftmost_position_of(board, block))
+                # Free cells up to the next block.
+                list.append(parts, ("\033[1;30;48m" + ("|   " if is_row_line else "----")) * (next_column - column))
+                if block is None:
+                    break
+                length = Block.get_length(block)
+                if is_row_line:
+                    color = "\033[1;" + str(Block.get_color(block)) + ";48m"
+                    block_symbol = Block.get_symbol(block)
+                    list.append(parts, color + "|" + block_symbol * 3 + (color + block_symbol * 4) * (length - 1))
+                else:
+                    list.append(parts, "\033[1;30;48m----" * length)
+                column = next_column + length
+            list.append(parts, "\033[1;30;48m" + ("|" if is_row_line else "-"))
+            list.append(lines, "".join(parts))
+    list.append(lines, "    " + "\033[1;30;48m" + ("-" * (nb_columns * 4 + 1)))
+    list.append(lines, "    " + "".join(["\033[1;30;48m" + '{:3d}'.format(column) + " "
+                                          for column in range(1, nb_columns + 1)]))
+    return lines
+
+
+def render_board(board):
+    """
+        Return a string displaying the given board on a terminal, each of its lines
+        (see render_board_lines) followed by a newline.
+        ASSUMPTIONS
+        - The given board is a proper board.
+    """
+    return "".join([line + "\n" for line in render_board_lines(board)])
+
+
+def is_proper_renderer(renderer):
+    """
+        Check whether the given renderer is a proper renderer.
+        - True if and only if the given renderer is a tuple consisting of an output
+          stream or None, a boolean telling whether the renderer is in incremental
+          mode, and a list holding the lines of the previous frame or None.
+        ASSUMPTIONS
+        - None
+    """
+    if not isinstance(renderer, tuple):
+        return False
+    if len(renderer) != 3:
+        return False
+    output, incremental, previous_lines = renderer
+    if (output is not None) and (not hasattr(output, "write")):
+        return False
+    if not isinstance(incremental, bool):
+        return False
+    return isinstance(previous_lines, list) and (len(previous_lines) == 1)
+
+
+def make_renderer(output=None, incremental=False):
+    """
+        Return a new renderer writing frames to the given output stream.
+        - If no output stream is given, frames are written to the standard output
+          stream as it is at the time of drawing.
+        - A renderer in incremental mode takes over the whole terminal: its first
+          frame clears the screen and is drawn at the top, and later frames only
+          redraw the lines that differ from the previous frame. The cursor is left
+          on the line below the frame, and everything below the frame is cleared
+          each time a frame is drawn.
+        - A renderer that is not in incremental mode writes each frame in full,
+          below whatever was written before.
+    """
+    return (output, incremental, [None])
+
+
+def is_incremental(renderer):
+    """
+        Check whether the given renderer is in incremental mode.
+        ASSUMPTIONS
+        - The given renderer is a proper renderer.
+    """
+    return renderer[1]
+
+
+def draw(renderer, board, footer_lines=()):
+    """
+        Draw the given board with the given renderer, followed by the given lines.
+        - The frame, consisting of the lines displaying the given board followed by
+          the given lines, is written to the output stream of the renderer at once.
+        ASSUMPTIONS
+        - The given renderer is a proper renderer.
+        - The given board is a proper board.
+        - None of the given lines contains a newline.
+    """
+    import sys
+    output, incremental, previous_lines = renderer
+    if output is None:
+        output = sys.stdout
+    lines = render_board_lines(board) + list(footer_lines)
+    if not incremental:
+        frame = "".join([line + "\n" for line in lines])
+    else:
+        # Cursor positions on the terminal are numbered starting from 1.
+        parts = []
+        if previous_lines[0] is None:
+            list.append(parts, "\033[H\033[2J")
+        for line_index in range(0, len(lines)):
+            if (previous_lines[0] is None) or (line_index >= len(previous_lines[0])) or \
+                    (previous_lines[0][line_index] != lines[line_index]):
+                list.append(parts, "\033[%d;1H" % (line_index + 1) + lines[line_index] + "\033[K")
+        list.append(parts, "\033[%d;1H\033[0m\033[J" % (len(lines) + 1))
+        frame = "".join(parts)
+    previous_lines[0] = lines
+    output.write(frame)
+    output.flush()
+
+
+def forget_previous_frame(renderer):
+    """
+        Make the given renderer draw its next frame in full.
+        - In incremental mode, the next frame clears the screen first. This is needed
+          if something else has been written over the previous frame.
+        ASSUMPTIONS
+        - The given renderer is a proper renderer.
+    """
+    renderer[2][0] = None
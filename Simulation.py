@@ -0,0 +1,155 @@
+# The simulation harness plays many games in a greedy way (see Game.play_greedy)
+# on randomly generated sequences of blocks, and streams the outcome of each game
+# to a file in the JSON Lines format. Each game is generated from its own seed,
+# such that the outcome of a game does not depend on the other games played.
+import Dimension
+import Board
+import Game
+
+
+def make_random_blocks(dimension, nb_rows_to_fill, max_block_length, seed):
+    """
+        Return a list of random blocks to fill the bottom row of a board with the
+        given dimension the given number of times, generated from the given seed.
+        - Each element of the resulting list is a list of tuples consisting of the
+          leftmost position of a block in the bottom row followed by that block.
+          Each of these lists fills the bottom row in the same way as
+          Board.fill_bottom_row does with the given maximum block length.
+        - The same seed always yields the same blocks.
+        - The state of the random module is restored afterwards, such that the
+          random numbers drawn by the caller do not depend on this function.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension.
+        - The given number of rows to fill is a non-negative integer number.
+        - The given maximum length is at least 2 and does not exceed halve the number
+          of columns in the given dimension.
+    """
+    import random
+    # Board.fill_bottom_row draws from the random module itself.
+    random_state = random.getstate()
+    random.seed(seed)
+    all_blocks = []
+    try:
+        for _ in range(0, nb_rows_to_fill):
+            board = Board.make_board(dimension)
+            Board.fill_bottom_row(board, max_block_length)
+            list.append(all_blocks, Board.get_all_placements(board))
+    finally:
+        random.setstate(random_state)
+    return all_blocks
+
+
+def get_default_max_block_length(dimension):
+    """
+        Return the maximum length of blocks used to fill the bottom row of a board
+        with the given dimension, if no maximum length is given.
+        - This is the maximum length Game.play_keyboard uses in the first levels.
+        ASSUMPTIONS
+        - The given dimension is a proper dimension with at least 4 columns.
+    """
+    return max(2, round(Dimension.get_nb_of_columns(dimension) / 4))
+
+
+def play_game(seed, dimension, nb_rows_to_fill, max_block_length):
+    """
+        Play a single game in a greedy way on a board with the given dimension,
+        using random blocks generated from the given seed (see make_random_blocks),
+        and return a dictionary with the outcome of that game.
+        - The resulting dictionary maps "seed" to the given seed, "score" to the total
+          score, "nb_moves" to the number of moves that have been made, "level" to the
+          level at the end of the game, and "wall_time" to the number of seconds it
+          took to play the game.
+        ASSUMPTIONS
+        - The given arguments satisfy all the assumptions of make_random_blocks.
+    """
+    import time
+    blocks = make_random_blocks(dimension, nb_rows_to_fill, max_block_length, seed)
+    start_time = time.perf_counter()
+    score, moves, level = Game.play_greedy_game(blocks, dimension)
+    wall_time = time.perf_counter() - start_time
+    return {"seed": seed, "score": score, "nb_moves": len(moves), "level": level, "wall_time": wall_time}
+
+
+def run_simulation(output_path, seeds, dimension=(8, 10), nb_rows_to_fill=100, max_block_length=None,
+                   nb_workers=None, window_size=None):
+    """
+        Play a game for each of the given seeds (see play_game), and write the outcome
+        of each game as a single line in JSON format to the file at the given path.
+        The function returns the number of games that have been played.
+        - The given seeds are an iterable of integer numbers. They are consumed one
+          at a time, such that they may be generated lazily.
+        - Games are played in parallel by a pool of the given number of processes
+          (see Game.get_process_pool). If no number of workers is given, there are as
+          many workers as processors. Games are played in the main process if a
+          single worker is requested.
+        - At most the given number of games are in progress at any time. If no window
+          size is given, that number is twice the number of workers. Outcomes are
+          written in the order of the given seeds, as soon as they are available.
+          Memory use is therefore bounded by the window size, whatever the number of
+          games to play.
+        - If the pool breaks down, it is discarded (see Game.discard_process_pool)
+          and the error is raised again. The outcomes written so far are kept.
+        - If no maximum block length is given, get_default_max_block_length is used.
+        ASSUMPTIONS
+        - The given dimension, the given number of rows to fill and the given maximum
+          block length satisfy all the assumptions of make_random_blocks.
+        - The given number of workers and the given window size are either None or
+          positive integer numbers.
+    """
+    import collections
+    import concurrent.futures.process
+    import json
+    import os
+    if max_block_length is None:
+        max_block_length = get_default_max_block_length(dimension)
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    if window_size is None:
+        window_size = 2 * nb_workers
+    nb_games = 0
+    with open(output_path, "w") as output_file:
+        if nb_workers == 1:
+            for seed in seeds:
+                output_file.write(json.dumps(play_game(seed, dimension, nb_rows_to_fill, max_block_length)) + "\n")
+                output_file.flush()
+                nb_games += 1
+            return nb_games
+        pool = Game.get_process_pool(nb_workers)
+        games_in_progress = collections.deque()
+        try:
+            for seed in seeds:
+                if len(games_in_progress) >= window_size:
+                    outcome = collections.deque.popleft(games_in_progress).result()
+                    output_file.write(json.dumps(outcome) + "\n")
+                    output_file.flush()
+                    nb_games += 1
+                collections.deque.append(games_in_progress,
+                                         pool.submit(play_game, seed, dimension, nb_rows_to_fill, max_block_length))
+            while len(games_in_progress) > 0:
+                outcome = collections.deque.popleft(games_in_progress).result()
+                output_file.write(json.dumps(outcome) + "\n")
+                output_file.flush()
+                nb_games += 1
+        except concurrent.futures.process.BrokenProcessPool:
+            Game.discard_process_pool(pool)
+            raise
+    return nb_games
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Play many seeded games in a greedy way.")
+    parser.add_argument("output_path", help="path of the JSON Lines file to write")
+    parser.add_argument("--nb-games", type=int, default=100)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--nb-rows", type=int, default=8)
+    parser.add_argument("--nb-columns", type=int, default=10)
+    parser.add_argument("--nb-rows-to-fill", type=int, default=100)
+    parser.add_argument("--max-block-length", type=int, default=None)
+    parser.add_argument("--nb-workers", type=int, default=None)
+    parser.add_argument("--window-size", type=int, default=None)
+    arguments = parser.parse_args()
+    run_simulation(arguments.output_path,
+                   range(arguments.first_seed, arguments.first_seed + arguments.nb_games),
+                   (arguments.nb_rows, arguments.nb_columns), arguments.nb_rows_to_fill,
+                   arguments.max_block_length, arguments.nb_workers, arguments.window_size)
@@ -0,0 +1,5 @@
+# The modules of the game live at the top level of the repository.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
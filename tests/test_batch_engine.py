@@ -0,0 +1,83 @@
+import random
+import pytest
+import Block
+import Board
+import Benchmark
+import Game
+import Position
+
+numpy = pytest.importorskip("numpy")
+import BatchEngine
+
+
+def get_scalar_scores(board, level, score, moves):
+    """
+        Return the score resulting from each of the given moves on the given board,
+        computed one move at a time by Game.stabilize_board.
+    """
+    scores = []
+    Board.set_checkpoint(board)
+    for (block, nb_steps) in moves:
+        Board.move_block_horizontally(board, block, nb_steps)
+        list.append(scores, Game.stabilize_board(level, score, board)[1])
+        Board.rollback_to_checkpoint(board)
+    Board.release_checkpoint(board)
+    return scores
+
+
+def make_dense_board(dimension, seed):
+    """
+        Return a board with the given dimension of which all rows but the top row
+        are nearly full, with many electrified and fragile blocks, generated from
+        the given seed. The board is in general not stable.
+    """
+    generator = random.Random(seed)
+    nb_rows, nb_columns = dimension
+    board = Board.make_board(dimension)
+    for row_nb in range(1, nb_rows):
+        column = 1
+        while column <= nb_columns:
+            if generator.random() < 0.12:
+                column += 1
+                continue
+            length = generator.randint(1, min(4, nb_columns - column + 1))
+            types = (Block.ORDINARY, Block.ELECTRIFIED, Block.ELECTRIFIED, Block.FRAGILE) if length > 1 \
+                else (Block.ORDINARY, Block.ELECTRIFIED)
+            block = Block.make_block(length, generator.choice(types), generator.randint(31, 37))
+            Board.add_block_at(board, block, Position.position_at(dimension, row_nb, column))
+            column += length
+    return board
+
+
+def get_all_moves(board):
+    return [(block, nb_steps) for block in Board.get_all_blocks(board)
+            for nb_steps in Game.get_all_possible_steps(board, block)]
+
+
+@pytest.mark.parametrize("seed", range(0, 40))
+def test_scores_of_moves_on_dense_boards(seed):
+    dimension = random.Random(seed).choice([(6, 6), (7, 8), (8, 10), (5, 12)])
+    board = make_dense_board(dimension, seed)
+    level, score = 1 + seed % 3, 5 * seed
+    moves = get_all_moves(board)
+    assert list(BatchEngine.get_scores_of_moves(board, level, score, moves)) == \
+        get_scalar_scores(board, level, score, moves)
+
+
+@pytest.mark.parametrize("dimension", [(8, 10), (16, 20)])
+@pytest.mark.parametrize("seed", range(0, 5))
+def test_scores_of_moves_on_stable_boards(dimension, seed):
+    board = Benchmark.make_stable_board(dimension, 0.6, seed)
+    Board.push_all_blocks_up(board)
+    Board.fill_bottom_row(board, 3)
+    Game.stabilize_board(1, 0, board)
+    moves = get_all_moves(board)
+    assert list(BatchEngine.get_scores_of_moves(board, 2, 100, moves)) == get_scalar_scores(board, 2, 100, moves)
+
+
+@pytest.mark.parametrize("seed", range(0, 10))
+def test_vectorized_move_with_highest_score(seed):
+    board = make_dense_board((8, 10), seed)
+    Game.stabilize_board(1, 0, board)
+    assert Game.get_move_with_highest_score(board, 1, 0, vectorized=True) == \
+        Game.get_move_with_highest_score(board, 1, 0)
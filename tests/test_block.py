@@ -0,0 +1,20 @@
+import pickle
+import Block
+
+
+def test_blocks_are_totally_ordered():
+    block1, block2 = Block.make_block(2), Block.make_block(2)
+    assert (block1 < block2) and (block1 <= block2) and (block2 > block1) and (block2 >= block1)
+    assert not ((block1 > block2) or (block1 >= block2) or (block2 < block1) or (block2 <= block1))
+    assert (block1 <= block1) and (block1 >= block1) and not (block1 < block1)
+    longer_block = Block.make_block(3)
+    assert sorted([longer_block, block2, block1]) == [block1, block2, longer_block]
+
+
+def test_copies_of_blocks_keep_their_serial_number():
+    block = Block.make_block(2, Block.FRAGILE)
+    copy = pickle.loads(pickle.dumps(block))
+    # Copies are different blocks, that are only distinguished by their identity.
+    assert (copy != block) and (Block.get_serial(copy) == Block.get_serial(block))
+    assert len({block, copy}) == 2
+    assert not ((copy < block) or (block < copy))
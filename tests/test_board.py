@@ -0,0 +1,54 @@
+import pytest
+import Board
+import Benchmark
+import Game
+
+
+def get_snapshot(board):
+    """
+        Return a snapshot of the state of the given board, in which blocks are
+        identified by their identity.
+    """
+    return (Board.get_state_hash(board),
+            [(position, id(block)) for (position, block) in Board.get_all_placements(board)])
+
+
+@pytest.mark.parametrize("seed", range(0, 5))
+def test_rollback_restores_an_equal_board(seed):
+    board = Benchmark.make_stable_board((8, 10), 0.6, seed)
+    snapshot = get_snapshot(board)
+    Board.set_checkpoint(board)
+    Board.push_all_blocks_up(board)
+    Board.fill_bottom_row(board, 3)
+    Game.stabilize_board(1, 0, board)
+    for block in Board.get_all_blocks(board):
+        steps = Game.get_all_possible_steps(board, block)
+        if len(steps) > 0:
+            Board.move_block_horizontally(board, block, steps[0])
+            Game.stabilize_board(1, 0, board)
+            break
+    assert get_snapshot(board) != snapshot
+    Board.rollback_to_checkpoint(board)
+    assert get_snapshot(board) == snapshot
+    Board.release_checkpoint(board)
+    assert Board.is_proper_board(board)
+    assert Board.get_checkpoints(board) == []
+    assert Board.get_undo_log(board) == []
+
+
+def test_rollback_to_nested_checkpoints():
+    board = Benchmark.make_stable_board((8, 10), 0.5, 7)
+    outer_snapshot = get_snapshot(board)
+    Board.set_checkpoint(board)
+    Board.push_all_blocks_up(board)
+    inner_snapshot = get_snapshot(board)
+    Board.set_checkpoint(board)
+    Board.fill_bottom_row(board, 3)
+    Game.stabilize_board(1, 0, board)
+    Board.rollback_to_checkpoint(board)
+    assert get_snapshot(board) == inner_snapshot
+    Board.release_checkpoint(board)
+    Board.rollback_to_checkpoint(board)
+    assert get_snapshot(board) == outer_snapshot
+    Board.release_checkpoint(board)
+    assert Board.is_proper_board(board)
@@ -0,0 +1,107 @@
+import pytest
+import Board
+import Benchmark
+import Cache
+import Game
+import Simulation
+
+
+class Interruption(Exception):
+    pass
+
+
+def interrupt_stabilize_board(monkeypatch, nb_calls):
+    """
+        Make Game.stabilize_board raise an Interruption from the given number
+        of calls on, after it has done its work.
+    """
+    stabilize_board = Game.stabilize_board
+    calls = [0]
+
+    def interrupted_stabilize_board(level, score, board, cache=None):
+        outcome = stabilize_board(level, score, board, cache)
+        calls[0] += 1
+        if calls[0] >= nb_calls:
+            raise Interruption()
+        return outcome
+
+    monkeypatch.setattr(Game, "stabilize_board", interrupted_stabilize_board)
+
+
+def get_snapshot(board):
+    return (Board.get_state_hash(board),
+            [(position, id(block)) for (position, block) in Board.get_all_placements(board)])
+
+
+@pytest.mark.parametrize("nb_calls", [1, 3])
+def test_get_move_with_highest_score_restores_the_board_on_exceptions(monkeypatch, nb_calls):
+    board = Benchmark.make_stable_board((8, 10), 0.6, 3)
+    # Filling the bottom row leaves moves that make blocks fall or explode.
+    Board.push_all_blocks_up(board)
+    Board.fill_bottom_row(board, 3)
+    snapshot = get_snapshot(board)
+    interrupt_stabilize_board(monkeypatch, nb_calls)
+    with pytest.raises(Interruption):
+        Game.get_move_with_highest_score(board, 1, 0)
+    assert get_snapshot(board) == snapshot
+    assert Board.get_checkpoints(board) == []
+    assert Board.is_proper_board(board)
+
+
+@pytest.mark.parametrize("nb_calls", [1, 5, 20])
+def test_get_top_moves_restores_the_board_and_the_blocks_on_exceptions(monkeypatch, nb_calls):
+    board = Benchmark.make_stable_board((6, 8), 0.4, 11)
+    blocks = Simulation.make_random_blocks((6, 8), 4, 2, 11)
+    blocks_on_entry = [row[:] for row in blocks]
+    snapshot = get_snapshot(board)
+    interrupt_stabilize_board(monkeypatch, nb_calls)
+    with pytest.raises(Interruption):
+        Game.get_top_moves(board, blocks, min_score=1000, max_nb_moves=3, transposition_table_size=0,
+                           stabilize_cache=Cache.make_cache(100), branch_and_bound=False)
+    assert get_snapshot(board) == snapshot
+    assert blocks == blocks_on_entry
+    assert Board.get_checkpoints(board) == []
+    assert Board.is_proper_board(board)
+
+
+def make_puzzle(dimension, seed):
+    """
+        Return a stable board with the given dimension and a list of blocks to fill
+        its bottom row with, both generated from the given seed.
+    """
+    board = Benchmark.make_stable_board(dimension, 0.3, seed)
+    blocks = Simulation.make_random_blocks(dimension, 5, Simulation.get_default_max_block_length(dimension), seed)
+    return (board, blocks)
+
+
+@pytest.mark.parametrize("seed", range(0, 6))
+@pytest.mark.parametrize("min_score", [10, 40])
+def test_get_top_moves_with_and_without_transposition_table(seed, min_score):
+    board, blocks = make_puzzle((6, 8), seed)
+    solution = Game.get_top_moves(board, blocks, min_score, 3, transposition_table_size=0)
+    for transposition_table_size in (10, 100000):
+        for iterative_deepening in (False, True):
+            assert Game.get_top_moves(board, blocks, min_score, 3, transposition_table_size=transposition_table_size,
+                                      iterative_deepening=iterative_deepening) == solution
+
+
+@pytest.mark.parametrize("seed", range(0, 4))
+@pytest.mark.parametrize("min_score", [10, 40])
+def test_get_top_moves_in_parallel(seed, min_score):
+    board, blocks = make_puzzle((6, 8), seed)
+    solution = Game.get_top_moves(board, blocks, min_score, 3)
+    for (split_depth, iterative_deepening) in ((1, False), (2, False), (1, True)):
+        parallel_solution = Game.get_top_moves(board, blocks, min_score, 3, nb_workers=2, split_depth=split_depth,
+                                               iterative_deepening=iterative_deepening)
+        assert parallel_solution == solution
+        if solution is not None:
+            # The blocks in the solution are the blocks on the given board.
+            assert all(move[1] is parallel_move[1] for (move, parallel_move) in zip(solution, parallel_solution))
+
+
+@pytest.mark.parametrize("seed", range(0, 6))
+@pytest.mark.parametrize("min_score", [10, 40, 100, 300])
+def test_get_top_moves_with_and_without_branch_and_bound(seed, min_score):
+    board, blocks = make_puzzle((6, 8), seed)
+    solution = Game.get_top_moves(board, blocks, min_score, 3, branch_and_bound=False)
+    assert Game.get_top_moves(board, blocks, min_score, 3, branch_and_bound=True) == solution
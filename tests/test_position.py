@@ -0,0 +1,12 @@
+import pytest
+import Position
+
+
+def test_position_at_within_the_boundaries():
+    assert Position.position_at((6, 8), 1, 1) == ("a", 1)
+    assert Position.position_at((6, 8), 6, 8) == ("X", 8)
+
+
+@pytest.mark.parametrize("row_nb, col", [(0, 1), (-1, 1), (7, 1), (1, 0), (1, 9), (2, 0), (0, 9)])
+def test_position_at_outside_the_boundaries(row_nb, col):
+    assert Position.position_at((6, 8), row_nb, col) is None
@@ -0,0 +1,90 @@
+import io
+import pytest
+import Board
+import Game
+import Recording
+import Simulation
+
+
+def record_greedy_game(dimension, seed):
+    """
+        Return the recording of a greedy game on a board with the given dimension,
+        followed by the final score, the moves and the final level of that game.
+    """
+    blocks = Simulation.make_random_blocks(dimension, 12, Simulation.get_default_max_block_length(dimension), seed)
+    output = io.BytesIO()
+    recorder = Recording.make_recorder(output, dimension)
+    score, moves, level = Game.play_greedy_game(blocks, dimension, recorder=recorder)
+    return (output.getvalue(), score, moves, level)
+
+
+@pytest.mark.parametrize("seed", range(0, 4))
+def test_replay_reaches_the_recorded_score(seed):
+    data, score, moves, level = record_greedy_game((6, 8), seed)
+    dimension, events = Recording.read_recording(data)
+    assert dimension == (6, 8)
+    assert len([event for event in events if event[0] == Recording.MOVE]) == len(moves)
+    board, replayed_level, replayed_score = Recording.replay(data)
+    assert Board.is_proper_board(board)
+    assert (replayed_level, replayed_score) == (level, score)
+
+
+@pytest.mark.parametrize("seed", range(0, 2))
+def test_jump_to_any_turn(seed):
+    data = record_greedy_game((6, 8), seed)[0]
+    replayer = Recording.make_replayer(data, snapshot_interval=3)
+    states = []
+    for turn in range(0, Recording.get_nb_of_turns(replayer) + 1):
+        Recording.jump_to(replayer, turn)
+        turn, board, level, score = Recording.get_state(replayer)
+        list.append(states, (turn, Board.get_state_hash(board), level, score))
+    for turn in (5, 0, 7, 2, Recording.get_nb_of_turns(replayer), 1):
+        Recording.jump_to(replayer, turn)
+        turn, board, level, score = Recording.get_state(replayer)
+        assert (turn, Board.get_state_hash(board), level, score) == states[turn]
+
+
+def make_header(dimension=(6, 8), magic=Recording.MAGIC, version=Recording.VERSION):
+    return Recording.HEADER_FORMAT.pack(magic, version, dimension[0], dimension[1])
+
+
+def make_row_event(*blocks):
+    return Recording.ROW_FORMAT.pack(Recording.INSERTED_ROW, len(blocks)) + \
+        b"".join(Recording.BLOCK_FORMAT.pack(*block) for block in blocks)
+
+
+def make_move_event(row_nb, column, nb_steps=1):
+    return Recording.MOVE_FORMAT.pack(Recording.MOVE, row_nb, column, nb_steps)
+
+
+def test_read_a_well_formed_recording():
+    data = make_header() + make_row_event((1, 2, 1, 1), (7, 2, 1, 1)) + \
+        make_move_event(1, 1) + make_move_event(6, 8, -1)
+    dimension, events = Recording.read_recording(data)
+    assert dimension == (6, 8)
+    assert events == [(Recording.INSERTED_ROW, ((1, 2, 1, 1), (7, 2, 1, 1))),
+                      (Recording.MOVE, ("a", 1), 1), (Recording.MOVE, ("X", 8), -1)]
+
+
+@pytest.mark.parametrize("data", [
+    pytest.param(b"", id="empty"),
+    pytest.param(make_header()[:-1], id="short_header"),
+    pytest.param(make_header(magic=b"BLKX"), id="bad_magic"),
+    pytest.param(make_header(version=Recording.VERSION + 1), id="bad_version"),
+    pytest.param(make_header((0, 8)), id="improper_dimension"),
+    pytest.param(make_header() + bytes([0]), id="unknown_event"),
+    pytest.param(make_header() + make_row_event((1, 2, 1, 1))[:-1], id="truncated_row"),
+    pytest.param(make_header() + make_move_event(1, 1)[:-1], id="truncated_move"),
+    pytest.param(make_header() + make_move_event(0, 1), id="move_from_row_0"),
+    pytest.param(make_header() + make_move_event(7, 1), id="move_from_row_7"),
+    pytest.param(make_header() + make_move_event(99, 1), id="move_from_row_99"),
+    pytest.param(make_header() + make_move_event(1, 0), id="move_from_column_0"),
+    pytest.param(make_header() + make_move_event(1, 9), id="move_from_column_9"),
+    pytest.param(make_header() + make_move_event(1, 50), id="move_from_column_50"),
+    pytest.param(make_header() + make_row_event((0, 2, 1, 1)), id="block_at_column_0"),
+    pytest.param(make_header() + make_row_event((7, 3, 1, 1)), id="block_beyond_last_column"),
+    pytest.param(make_header() + make_row_event((1, 0, 1, 1)), id="block_of_length_0"),
+])
+def test_reject_malformed_recordings(data):
+    with pytest.raises(ValueError):
+        Recording.read_recording(data)